@@ -0,0 +1,120 @@
+"""
+Benchmark zużycia pamięci kampanii: strumieniowy zapis vs przechowywanie RunResult.
+
+Symuluje kampanię dla N potencjalnych klientów, w której każdy przebieg
+zwraca "ciężki" wynik (elementy rozmowy, surowe odpowiedzi) o rozmiarze
+zbliżonym do prawdziwego RunResult. Wywołania modelu nie są wykonywane.
+
+Uruchomienie:
+    python benchmarks/bench_campaign_memory.py              # 100k, tryb strumieniowy
+    python benchmarks/bench_campaign_memory.py --retain     # dla porównania: trzymanie wyników
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SENDGRID_API_KEY", "benchmark")
+
+from campaign import JsonlResultSink, extract_record, run_campaign  # noqa: E402
+
+
+def current_rss_mb() -> float:
+    """Zwraca bieżące RSS procesu w MB (Linux) lub szczytowe RSS na innych systemach."""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (FileNotFoundError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def fake_run_result(prospect: dict, payload_kb: int) -> SimpleNamespace:
+    """Tworzy obiekt o kształcie RunResult z dużą ilością danych pobocznych."""
+    chunk = "x" * 1024
+    return SimpleNamespace(
+        final_output=f"Dear {prospect['first_name']}, ...",
+        new_items=[chunk + str(i) for i in range(payload_kb // 2)],
+        raw_responses=[chunk + str(i) for i in range(payload_kb // 2)],
+        last_agent=SimpleNamespace(name="Sales Manager"),
+        context_wrapper=SimpleNamespace(
+            usage=SimpleNamespace(requests=4, input_tokens=1200, output_tokens=600)
+        ),
+    )
+
+
+def prospects(count: int):
+    """Generator potencjalnych klientów - lista nie jest trzymana w pamięci."""
+    for i in range(count):
+        yield {"email": f"prospect{i}@example.com", "first_name": f"Name{i}"}
+
+
+async def bench_streaming(count: int, payload_kb: int, concurrency: int) -> list[float]:
+    """Kampania z run_campaign i JsonlResultSink; zwraca próbki RSS."""
+    samples: list[float] = []
+    step = max(count // 10, 1)
+    done = 0
+
+    async def pipeline(prospect: dict) -> SimpleNamespace:
+        nonlocal done
+        await asyncio.sleep(0)
+        done += 1
+        if done % step == 0:
+            samples.append(current_rss_mb())
+        return fake_run_result(prospect, payload_kb)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with JsonlResultSink(os.path.join(tmp, "results.jsonl")) as sink:
+            await run_campaign(prospects(count), pipeline, sink, max_concurrency=concurrency)
+    return samples
+
+
+async def bench_retained(count: int, payload_kb: int) -> list[float]:
+    """Dotychczasowe podejście: lista pełnych wyników; zwraca próbki RSS."""
+    samples: list[float] = []
+    step = max(count // 10, 1)
+    results = []
+    for i, prospect in enumerate(prospects(count), 1):
+        await asyncio.sleep(0)
+        results.append(fake_run_result(prospect, payload_kb))
+        if i % step == 0:
+            samples.append(current_rss_mb())
+    # Rekordy powstają dopiero na końcu, gdy wszystkie wyniki są już w pamięci
+    [extract_record(str(i), result) for i, result in enumerate(results)]
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--prospects", type=int, default=100_000)
+    parser.add_argument("--payload-kb", type=int, default=16, help="Rozmiar danych pobocznych")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--retain", action="store_true", help="Tryb przechowywania wyników")
+    args = parser.parse_args()
+
+    start_rss = current_rss_mb()
+    start = time.perf_counter()
+    if args.retain:
+        samples = asyncio.run(bench_retained(args.prospects, args.payload_kb))
+    else:
+        samples = asyncio.run(bench_streaming(args.prospects, args.payload_kb, args.concurrency))
+    elapsed = time.perf_counter() - start
+
+    mode = "retained RunResult" if args.retain else "streaming JSONL"
+    print(f"Tryb: {mode}, klienci: {args.prospects}, czas: {elapsed:.1f}s")
+    print(f"RSS na starcie: {start_rss:.1f} MB")
+    for i, rss in enumerate(samples, 1):
+        print(f"  po {i * 10:3d}%: {rss:8.1f} MB")
+    half = samples[len(samples) // 2 :]
+    if half:
+        print(f"Wzrost RSS w drugiej połowie: {max(half) - min(half):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark kompaktowania kontekstu w przepływie kierownika sprzedaży z handoff.
+
+Uruchamia w tle mocki OpenAI i SendGrid (benchmarks/mock_servers.py).
+Mock OpenAI każe kierownikowi wywołać narzędzia sales_agent w kilku
+rundach, a opóźnienie odpowiedzi rośnie z liczbą tokenów wejściowych
+i wyjściowych (także argumentów wywołań narzędzi, np. handoffu).
+Ten sam przepływ jest wykonywany bez kompaktowania (pełna historia,
+zwykły handoff) i z kompaktowaniem (compacting_run_config +
+winning_draft_handoff). Raportowane są tokeny wejściowe i wyjściowe
+każdej tury oraz opóźnienie całego przebiegu.
+
+Uruchomienie:
+    python benchmarks/bench_compaction.py --runs 20 --rounds 3
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agents import (  # noqa: E402
+    Runner,
+    set_default_openai_api,
+    set_default_openai_client,
+    set_tracing_disabled,
+)
+from mock_servers import (  # noqa: E402
+    BackgroundServer,
+    MockBehavior,
+    create_openai_app,
+    create_sendgrid_app,
+)
+from openai import AsyncOpenAI  # noqa: E402
+
+MESSAGE = "Send out a cold sales email addressed to Dear CEO from Alice"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+async def run_variant(
+    compact: bool, runs: int
+) -> tuple[list[list[tuple[int, int]]], list[float]]:
+    """
+    Wykonuje przepływ z handoff `runs` razy.
+
+    Returns:
+        Tuple (tokeny wejściowe i wyjściowe kolejnych tur dla każdego przebiegu,
+        opóźnienia w sekundach)
+    """
+    import main
+    from compaction import compacting_run_config, winning_draft_handoff
+
+    tokens_per_run, latencies = [], []
+    for _ in range(runs):
+        sales_tools = main.create_sales_agent_tools(*main.create_sales_agents())
+        email_manager = main.create_parallel_email_manager_agent()
+        if compact:
+            manager = main.create_sales_manager_with_handoff(
+                sales_tools, winning_draft_handoff(email_manager)
+            )
+            run_config = compacting_run_config()
+        else:
+            manager = main.create_sales_manager_with_handoff(sales_tools, email_manager)
+            run_config = None
+
+        start = time.perf_counter()
+        result = await Runner.run(manager, MESSAGE, run_config=run_config)
+        latencies.append(time.perf_counter() - start)
+        tokens_per_run.append(
+            [
+                (response.usage.input_tokens, response.usage.output_tokens)
+                for response in result.raw_responses
+            ]
+        )
+    return tokens_per_run, latencies
+
+
+def print_variant(
+    label: str, tokens_per_run: list[list[tuple[int, int]]], latencies: list[float]
+) -> None:
+    turns = max(len(tokens) for tokens in tokens_per_run)
+    print(f"\n{label}")
+    print("-" * 60)
+    for turn in range(turns):
+        values = [tokens[turn] for tokens in tokens_per_run if len(tokens) > turn]
+        input_avg = sum(value[0] for value in values) / len(values)
+        output_avg = sum(value[1] for value in values) / len(values)
+        print(f"  tura {turn + 1}: {input_avg:>8.0f} wejściowych, {output_avg:>6.0f} wyjściowych")
+    runs = len(tokens_per_run)
+    total_input = sum(value[0] for tokens in tokens_per_run for value in tokens) / runs
+    total_output = sum(value[1] for tokens in tokens_per_run for value in tokens) / runs
+    print(
+        f"  razem na przebieg: {total_input:.0f} tokenów wejściowych, "
+        f"{total_output:.0f} wyjściowych"
+    )
+    print(
+        f"  opóźnienie p50={percentile(latencies, 0.5) * 1000:.0f}ms "
+        f"p90={percentile(latencies, 0.9) * 1000:.0f}ms"
+    )
+
+
+async def run_benchmark(openai_url: str, runs: int) -> None:
+    set_tracing_disabled(True)
+    set_default_openai_api("responses")
+    set_default_openai_client(
+        AsyncOpenAI(base_url=f"{openai_url}/v1", api_key="mock"), use_for_tracing=False
+    )
+
+    for label, compact in (("Bez kompaktowania", False), ("Z kompaktowaniem", True)):
+        tokens_per_run, latencies = await run_variant(compact, runs)
+        print_variant(label, tokens_per_run, latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark kompaktowania kontekstu kierownika")
+    parser.add_argument("--runs", type=int, default=10, help="Liczba przebiegów na wariant")
+    parser.add_argument("--rounds", type=int, default=3, help="Rundy narzędzi sales_agent")
+    parser.add_argument("--words", type=int, default=200, help="Długość wersji roboczej (słowa)")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Mediana opóźnienia mocka")
+    parser.add_argument(
+        "--ms-per-1k-tokens", type=float, default=50.0, help="Koszt 1000 tokenów wejściowych"
+    )
+    parser.add_argument(
+        "--ms-per-1k-output-tokens",
+        type=float,
+        default=8000.0,
+        help="Koszt 1000 tokenów wyjściowych (ok. 125 tokenów/s)",
+    )
+    parser.add_argument("--openai-port", type=int, default=8100)
+    parser.add_argument("--sendgrid-port", type=int, default=8101)
+    args = parser.parse_args()
+
+    openai_behavior = MockBehavior(
+        median_latency_ms=args.latency_ms,
+        latency_sigma=0.0,
+        words_per_email=args.words,
+        latency_per_1k_input_tokens_ms=args.ms_per_1k_tokens,
+        latency_per_1k_output_tokens_ms=args.ms_per_1k_output_tokens,
+        sales_rounds=args.rounds,
+    )
+    sendgrid_behavior = MockBehavior(median_latency_ms=10.0, latency_sigma=0.0)
+
+    with BackgroundServer(create_openai_app(openai_behavior), args.openai_port) as openai_server:
+        with BackgroundServer(
+            create_sendgrid_app(sendgrid_behavior), args.sendgrid_port
+        ) as sendgrid_server:
+            os.environ["SENDGRID_API_KEY"] = "mock"
+            os.environ["SENDGRID_HOST"] = sendgrid_server.url
+            print(f"Przebiegi: {args.runs}, rundy narzędzi: {args.rounds}")
+            asyncio.run(run_benchmark(openai_server.url, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark usługi HTTP (service.py): czas do pierwszego bajtu i równoczesne strumienie.
+
+Uruchamia w tle mock OpenAI (benchmarks/mock_servers.py) oraz usługę,
+a następnie otwiera N równoczesnych strumieni POST /emails/stream.
+Raportuje czas do pierwszej delty (TTFB), czas całego strumienia,
+liczbę odrzuconych żądań (429) i przepustowość.
+
+Usługa rozpoznaje klientów po adresie połączenia, więc każdy symulowany
+klient łączy się z innego adresu pętli zwrotnej (127.0.x.y, Linux).
+
+Uruchomienie:
+    python benchmarks/bench_service.py --streams 500 --clients 100
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SENDGRID_API_KEY", "benchmark")
+
+from agents import set_tracing_disabled  # noqa: E402
+from mock_servers import BackgroundServer, MockBehavior, create_openai_app  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+
+from service import create_app  # noqa: E402
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def loopback_address(index: int) -> str:
+    """Adres pętli zwrotnej symulowanego klienta (127.0.0.1, 127.0.0.2, ...)."""
+    index += 1
+    return f"127.0.{index // 254}.{index % 254 or 254}"
+
+
+async def open_stream(client: httpx.AsyncClient, url: str) -> tuple:
+    """Otwiera jeden strumień; zwraca (status, TTFB, czas całkowity)."""
+    start = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", url, json={"message": "Write a cold sales email"}) as response:
+        async for line in response.aiter_lines():
+            if ttfb is None and line.startswith("data:"):
+                ttfb = time.perf_counter() - start
+    return response.status_code, ttfb, time.perf_counter() - start
+
+
+async def run_benchmark(service_url: str, streams: int, clients: int) -> None:
+    limits = httpx.Limits(max_connections=streams, max_keepalive_connections=streams)
+    http_clients = [
+        httpx.AsyncClient(
+            timeout=120,
+            transport=httpx.AsyncHTTPTransport(local_address=loopback_address(i), limits=limits),
+        )
+        for i in range(clients)
+    ]
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                open_stream(http_clients[i % clients], f"{service_url}/emails/stream")
+                for i in range(streams)
+            )
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        await asyncio.gather(*(client.aclose() for client in http_clients))
+
+    ok = [result for result in results if result[0] == 200]
+    rejected = sum(1 for result in results if result[0] == 429)
+    ttfbs = [result[1] for result in ok if result[1] is not None]
+    totals = [result[2] for result in ok]
+
+    print(f"Strumienie: {streams}, klienci: {clients}, czas: {elapsed:.2f}s")
+    print(f"Udane: {len(ok)}, odrzucone (429): {rejected}, inne: {streams - len(ok) - rejected}")
+    print(f"Przepustowość: {len(ok) / elapsed:.1f} strumieni/s")
+    print(
+        f"TTFB   p50={percentile(ttfbs, 0.5) * 1000:.0f}ms "
+        f"p90={percentile(ttfbs, 0.9) * 1000:.0f}ms p99={percentile(ttfbs, 0.99) * 1000:.0f}ms"
+    )
+    print(
+        f"Całość p50={percentile(totals, 0.5) * 1000:.0f}ms "
+        f"p90={percentile(totals, 0.9) * 1000:.0f}ms p99={percentile(totals, 0.99) * 1000:.0f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark TTFB i równoczesnych strumieni usługi")
+    parser.add_argument("--streams", type=int, default=200, help="Liczba równoczesnych strumieni")
+    parser.add_argument("--clients", type=int, default=50, help="Liczba klientów (adresów)")
+    parser.add_argument("--per-client", type=int, default=4, help="Limit żądań na klienta")
+    parser.add_argument(
+        "--max-runs", type=int, default=200, help="Limit równoczesnych przebiegów usługi"
+    )
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Mediana opóźnienia mocka")
+    parser.add_argument("--delta-ms", type=float, default=10.0, help="Odstęp między deltami")
+    parser.add_argument("--openai-port", type=int, default=8100)
+    parser.add_argument("--service-port", type=int, default=8000)
+    args = parser.parse_args()
+
+    set_tracing_disabled(True)
+    behavior = MockBehavior(median_latency_ms=args.latency_ms, delta_interval_ms=args.delta_ms)
+
+    with BackgroundServer(create_openai_app(behavior), args.openai_port) as openai_server:
+        openai_client = AsyncOpenAI(base_url=f"{openai_server.url}/v1", api_key="mock")
+        service_app = create_app(
+            openai_client,
+            max_requests_per_client=args.per_client,
+            max_concurrent_runs=args.max_runs,
+        )
+        with BackgroundServer(service_app, args.service_port) as service:
+            asyncio.run(run_benchmark(service.url, args.streams, args.clients))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Test obciążeniowy przepływów z main.py na lokalnych mockach OpenAI i SendGrid.
+
+Uruchamia w tle mocki z benchmarks/mock_servers.py, kieruje do nich
+klienta OpenAI i SendGrid, a następnie wykonuje N przebiegów każdego
+przepływu z zadaną współbieżnością. Raportuje przepustowość, histogram
+opóźnień oraz błędy (w tym 429 i 500 zwrócone przez mocki).
+
+Uruchomienie:
+    python benchmarks/load_test.py --runs 200 --concurrency 50
+    python benchmarks/load_test.py --pipelines handoff --openai-429-rate 0.05
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+from typing import Awaitable, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_servers import (  # noqa: E402
+    BackgroundServer,
+    ServerStats,
+    add_behavior_arguments,
+    behavior_from_arguments,
+    create_openai_app,
+    create_sendgrid_app,
+)
+from profiling import Profiler  # noqa: E402
+
+# Granice przedziałów histogramu opóźnień (sekundy)
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+
+# ============================================================================
+# PRZEPŁYWY
+# ============================================================================
+
+
+def pipelines() -> Dict[str, Callable[[], Awaitable[None]]]:
+    """
+    Zwraca przepływy do obciążenia: trzy demonstracje, streaming i main().
+
+    Import main następuje dopiero tutaj, po ustawieniu zmiennych
+    środowiskowych wskazujących na mock SendGrid.
+    """
+    import main
+
+    async def streaming() -> None:
+        agent, _, _ = main.create_sales_agents()
+        await main.demonstrate_streaming(agent, "Write a cold sales email")
+
+    return {
+        "streaming": streaming,
+        "basic": main.demo_basic_workflow,
+        "tools": main.demo_sales_manager_with_tools,
+        "handoff": main.demo_sales_manager_with_handoff,
+        "main": main.main,
+    }
+
+
+# ============================================================================
+# POMIARY
+# ============================================================================
+
+
+class PipelineReport:
+    """Wyniki przebiegów jednego przepływu."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.errors: Dict[str, int] = {}
+        self.elapsed = 0.0
+
+    def record(self, latency: float, error: Exception | None) -> None:
+        if error is None:
+            self.latencies.append(latency)
+        else:
+            key = type(error).__name__
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def percentile(self, fraction: float) -> float:
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def print(self) -> None:
+        ok = len(self.latencies)
+        failed = sum(self.errors.values())
+        throughput = ok / self.elapsed if self.elapsed else 0.0
+        print(f"\n--- {self.name} ---")
+        print(
+            f"Udane: {ok}, nieudane: {failed}, czas: {self.elapsed:.2f}s, "
+            f"przepustowość: {throughput:.2f} przebiegów/s"
+        )
+        if ok:
+            print(
+                f"Opóźnienie p50={self.percentile(0.5):.3f}s p90={self.percentile(0.9):.3f}s "
+                f"p99={self.percentile(0.99):.3f}s max={max(self.latencies):.3f}s"
+            )
+            lower = 0.0
+            for upper in HISTOGRAM_BUCKETS:
+                count = sum(1 for latency in self.latencies if lower <= latency < upper)
+                if count:
+                    label = f"{lower:5.2f}-{upper:5.2f}s"
+                    if upper == float("inf"):
+                        label = f"{lower:5.2f}s+"
+                    print(f"  {label:>13} {count:6d} {'#' * max(1, 50 * count // ok)}")
+                lower = upper
+        for error, count in sorted(self.errors.items()):
+            print(f"  błąd {error}: {count}")
+
+
+async def drive(
+    name: str, pipeline: Callable[[], Awaitable[None]], runs: int, concurrency: int
+) -> PipelineReport:
+    """
+    Wykonuje `runs` przebiegów przepływu z co najwyżej `concurrency` równoczesnymi.
+
+    Returns:
+        Raport z opóźnieniami i błędami
+    """
+    report = PipelineReport(name)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await pipeline()
+            except Exception as e:
+                report.record(time.perf_counter() - start, e)
+            else:
+                report.record(time.perf_counter() - start, None)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(runs)))
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def print_server_stats(label: str, stats: ServerStats) -> None:
+    counts = ", ".join(f"{status}: {count}" for status, count in sorted(stats.by_status.items()))
+    print(f"{label}: {counts or 'brak żądań'}")
+
+
+# ============================================================================
+# GŁÓWNA FUNKCJA
+# ============================================================================
+
+
+async def run_load_test(args: argparse.Namespace, openai_url: str) -> list[PipelineReport]:
+    """Konfiguruje SDK na mock OpenAI i uruchamia kolejno wybrane przepływy."""
+    from agents import set_default_openai_api, set_default_openai_client, set_tracing_disabled
+    from openai import AsyncOpenAI
+
+    set_tracing_disabled(True)
+    set_default_openai_api("responses")
+    set_default_openai_client(
+        AsyncOpenAI(base_url=f"{openai_url}/v1", api_key="mock", max_retries=args.max_retries),
+        use_for_tracing=False,
+    )
+
+    available = pipelines()
+    reports = []
+    for name in args.pipelines:
+        # Demonstracje drukują wygenerowane e-maile - wyciszamy je na czas pomiaru
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = await drive(name, available[name], args.runs, args.concurrency)
+        report.print()
+        reports.append(report)
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Test obciążeniowy przepływów sprzedażowych")
+    parser.add_argument("--runs", type=int, default=100, help="Liczba przebiegów na przepływ")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--pipelines",
+        nargs="+",
+        default=["streaming", "basic", "tools", "handoff", "main"],
+        choices=["streaming", "basic", "tools", "handoff", "main"],
+    )
+    parser.add_argument("--max-retries", type=int, default=2, help="Ponowienia klienta OpenAI")
+    parser.add_argument("--profile", metavar="PLIK", help="Profilowanie etapów + flamegraph do PLIK")
+    parser.add_argument("--openai-port", type=int, default=8100)
+    parser.add_argument("--sendgrid-port", type=int, default=8101)
+    add_behavior_arguments(parser, "openai", 300.0)
+    add_behavior_arguments(parser, "sendgrid", 100.0)
+    args = parser.parse_args()
+
+    openai_stats, sendgrid_stats = ServerStats(), ServerStats()
+    openai_app = create_openai_app(behavior_from_arguments(args, "openai"), openai_stats)
+    sendgrid_app = create_sendgrid_app(behavior_from_arguments(args, "sendgrid"), sendgrid_stats)
+
+    with BackgroundServer(openai_app, args.openai_port) as openai_server:
+        with BackgroundServer(sendgrid_app, args.sendgrid_port) as sendgrid_server:
+            os.environ["SENDGRID_API_KEY"] = "mock"
+            os.environ["SENDGRID_HOST"] = sendgrid_server.url
+            print(f"Przebiegi na przepływ: {args.runs}, współbieżność: {args.concurrency}")
+            if args.profile:
+                # CPU mocków (osobne wątki) trafia do "(poza etapami)"
+                with Profiler() as profiler:
+                    asyncio.run(run_load_test(args, openai_server.url))
+                profiler.print_report()
+                profiler.write_flamegraph(args.profile)
+                print(f"🔥 Próbki stosów (flamegraph): {args.profile}")
+            else:
+                asyncio.run(run_load_test(args, openai_server.url))
+
+    print()
+    print_server_stats("Mock OpenAI - odpowiedzi", openai_stats)
+    print_server_stats("Mock SendGrid - odpowiedzi", sendgrid_stats)
+
+
+if __name__ == "__main__":
+    main()
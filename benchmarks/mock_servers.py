@@ -0,0 +1,476 @@
+"""
+Lokalne zamienniki API OpenAI (Responses) i SendGrid do testów obciążeniowych.
+
+Mock OpenAI obsługuje POST /v1/responses w trybie zwykłym i strumieniowym
+(SSE), zgodnie z formatem oczekiwanym przez OpenAI Agents SDK. Odpowiedzi
+są "scenariuszem" odtwarzającym przepływy z main.py: kierownik sprzedaży
+wywołuje narzędzia sales_agent*, potem handoff lub narzędzie wysyłki,
+a pozostali agenci zwracają tekst e-maila.
+
+Mock SendGrid obsługuje POST /v3/mail/send i odpowiada statusem 202.
+
+Oba serwery mają konfigurowalny rozkład opóźnień, odsetek błędów 500
+i odsetek odpowiedzi 429 (z nagłówkiem Retry-After).
+
+Uruchomienie samodzielne:
+    python benchmarks/mock_servers.py --openai-port 8100 --sendgrid-port 8101
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# ============================================================================
+# KONFIGURACJA ZACHOWANIA
+# ============================================================================
+
+# Kolejne etapy scenariusza: model wywołuje pierwszy etap, którego narzędzia
+# są dostępne i nie zostały jeszcze użyte w bieżącej rozmowie
+TOOL_STAGES = (
+    ("sales_agent",),
+    ("subject_writer", "html_converter"),
+    ("transfer_to_",),
+    ("send_email", "send_html_email", "format_and_send_email"),
+)
+
+# Argument wywołań narzędzi sales_agent (kierownik zleca napisanie wersji roboczej)
+SALES_BRIEF = "Write a cold sales email"
+
+
+@dataclass
+class MockBehavior:
+    """
+    Parametry opóźnień i błędów serwera.
+
+    Opóźnienie ma rozkład log-normalny o zadanej medianie; sigma = 0
+    daje stałe opóźnienie. Dla strumieniowania opóźnienie dotyczy
+    pierwszego bajtu, a kolejne fragmenty przychodzą co delta_interval_ms.
+
+    latency_per_1k_input_tokens_ms dolicza koszt przetwarzania wejścia
+    (rośnie z długością rozmowy), latency_per_1k_output_tokens_ms - koszt
+    generowania odpowiedzi (także argumentów wywołań narzędzi), a sales_rounds
+    określa, ile razy kierownik sprzedaży wywołuje każde narzędzie sales_agent.
+    """
+
+    median_latency_ms: float = 300.0
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_s: float = 0.1
+    delta_interval_ms: float = 10.0
+    words_per_email: int = 80
+    latency_per_1k_input_tokens_ms: float = 0.0
+    latency_per_1k_output_tokens_ms: float = 0.0
+    sales_rounds: int = 1
+    seed: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        self._random = random.Random(self.seed)
+
+    def sample_latency(self) -> float:
+        """Losuje opóźnienie w sekundach."""
+        if self.latency_sigma <= 0:
+            return self.median_latency_ms / 1000
+        return self._random.lognormvariate(0, self.latency_sigma) * self.median_latency_ms / 1000
+
+    def sample_failure(self) -> Optional[Response]:
+        """Zwraca odpowiedź błędu (429 lub 500) albo None, gdy żądanie ma się powieść."""
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}},
+                status_code=429,
+                headers={"retry-after": str(self.retry_after_s)},
+            )
+        if roll < self.rate_limit_rate + self.error_rate:
+            return JSONResponse(
+                {"error": {"message": "Internal server error (mock)", "type": "server_error"}},
+                status_code=500,
+            )
+        return None
+
+
+class ServerStats:
+    """Liczniki żądań obsłużonych przez mock (według statusu)."""
+
+    def __init__(self) -> None:
+        self.by_status: Dict[int, int] = {}
+
+    def record(self, status: int) -> None:
+        self.by_status[status] = self.by_status.get(status, 0) + 1
+
+
+# ============================================================================
+# MOCK OPENAI RESPONSES API
+# ============================================================================
+
+_ids = itertools.count(1)
+
+
+def _next_id(prefix: str) -> str:
+    return f"{prefix}_mock{next(_ids)}"
+
+
+def _dummy_arguments(tool: Dict[str, Any], text: str, draft_id: Optional[str] = None) -> str:
+    """Wypełnia wymagane parametry narzędzia przykładowym tekstem (draft_id - odnośnikiem)."""
+    properties = tool.get("parameters", {}).get("properties", {})
+    return json.dumps(
+        {name: draft_id if name == "draft_id" and draft_id else text for name in properties}
+    )
+
+
+def _input_tokens(payload: Dict[str, Any]) -> int:
+    """Przybliżona liczba tokenów wejściowych (4 znaki JSON na token)."""
+    return len(json.dumps(payload.get("input", ""))) // 4
+
+
+def _output_tokens(output: list[Dict[str, Any]]) -> int:
+    """Przybliżona liczba tokenów wyjściowych (4 znaki JSON na token)."""
+    return sum(len(json.dumps(item)) // 4 for item in output)
+
+
+def plan_output(
+    payload: Dict[str, Any], email_text: str, sales_rounds: int = 1
+) -> list[Dict[str, Any]]:
+    """
+    Wyznacza elementy odpowiedzi modelu dla danego żądania.
+
+    Args:
+        payload: Ciało żądania POST /v1/responses
+        email_text: Tekst zwracany, gdy model odpowiada wiadomością
+        sales_rounds: Ile razy wywołać każde narzędzie sales_agent
+
+    Returns:
+        Lista elementów "output" (wywołania funkcji lub jedna wiadomość)
+    """
+    tools = [tool for tool in payload.get("tools") or [] if tool.get("type") == "function"]
+    input_items = payload.get("input")
+    history = input_items if isinstance(input_items, list) else []
+    called = Counter(
+        item.get("name") for item in history if item.get("type") == "function_call"
+    )
+    # Zwycięska wersja robocza (handoff z draft_id) - ostatni wynik narzędzia sales_agent
+    sales_calls = [
+        item.get("call_id")
+        for item in history
+        if item.get("type") == "function_call"
+        and str(item.get("name", "")).startswith("sales_agent")
+    ]
+    draft_id = sales_calls[-1] if sales_calls else None
+
+    for stage in TOOL_STAGES:
+        rounds = sales_rounds if stage == ("sales_agent",) else 1
+        pending = [
+            tool
+            for tool in tools
+            if tool["name"].startswith(stage) and called[tool["name"]] < rounds
+        ]
+        if pending:
+            # Handoff i wysyłka odbywają się dokładnie raz
+            if stage[0] in ("transfer_to_", "send_email"):
+                pending = pending[:1]
+            # Agenci sprzedaży dostają krótkie polecenie, pozostałe narzędzia - tekst e-maila
+            text = SALES_BRIEF if stage == ("sales_agent",) else email_text
+            return [
+                {
+                    "type": "function_call",
+                    "id": _next_id("fc"),
+                    "call_id": _next_id("call"),
+                    "name": tool["name"],
+                    "arguments": _dummy_arguments(tool, text, draft_id),
+                    "status": "completed",
+                }
+                for tool in pending
+            ]
+
+    return [_message_item(email_text)]
+
+
+def _message_item(text: str) -> Dict[str, Any]:
+    return {
+        "type": "message",
+        "id": _next_id("msg"),
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": text, "annotations": []}],
+    }
+
+
+def _response_object(
+    payload: Dict[str, Any], output: list[Dict[str, Any]], status: str = "completed"
+) -> Dict[str, Any]:
+    output_tokens = _output_tokens(output)
+    input_tokens = _input_tokens(payload)
+    return {
+        "id": _next_id("resp"),
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": payload.get("model", "gpt-4o-mini"),
+        "status": status,
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def _sse(event: Dict[str, Any]) -> bytes:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def _stream_events(
+    payload: Dict[str, Any], output: list[Dict[str, Any]], behavior: MockBehavior
+) -> AsyncIterator[bytes]:
+    """Generuje zdarzenia SSE Responses API; tekst wiadomości jest dzielony na delty."""
+    sequence = itertools.count()
+    final = _response_object(payload, output)
+    created = dict(final, status="in_progress", output=[], usage=None)
+
+    yield _sse({"type": "response.created", "sequence_number": next(sequence), "response": created})
+
+    for index, item in enumerate(output):
+        if item["type"] != "message":
+            yield _sse({
+                "type": "response.output_item.added",
+                "sequence_number": next(sequence),
+                "output_index": index,
+                "item": item,
+            })
+        else:
+            text = item["content"][0]["text"]
+            empty_part = {"type": "output_text", "text": "", "annotations": []}
+            yield _sse({
+                "type": "response.output_item.added",
+                "sequence_number": next(sequence),
+                "output_index": index,
+                "item": dict(item, status="in_progress", content=[]),
+            })
+            yield _sse({
+                "type": "response.content_part.added",
+                "sequence_number": next(sequence),
+                "item_id": item["id"],
+                "output_index": index,
+                "content_index": 0,
+                "part": empty_part,
+            })
+            for word in text.split(" "):
+                await asyncio.sleep(behavior.delta_interval_ms / 1000)
+                yield _sse({
+                    "type": "response.output_text.delta",
+                    "sequence_number": next(sequence),
+                    "item_id": item["id"],
+                    "output_index": index,
+                    "content_index": 0,
+                    "delta": word + " ",
+                    "logprobs": [],
+                })
+            yield _sse({
+                "type": "response.output_text.done",
+                "sequence_number": next(sequence),
+                "item_id": item["id"],
+                "output_index": index,
+                "content_index": 0,
+                "text": text,
+                "logprobs": [],
+            })
+            yield _sse({
+                "type": "response.content_part.done",
+                "sequence_number": next(sequence),
+                "item_id": item["id"],
+                "output_index": index,
+                "content_index": 0,
+                "part": item["content"][0],
+            })
+        yield _sse({
+            "type": "response.output_item.done",
+            "sequence_number": next(sequence),
+            "output_index": index,
+            "item": item,
+        })
+
+    yield _sse({"type": "response.completed", "sequence_number": next(sequence), "response": final})
+
+
+def create_openai_app(behavior: MockBehavior, stats: Optional[ServerStats] = None) -> Starlette:
+    """
+    Tworzy aplikację ASGI udającą endpoint POST /v1/responses.
+
+    Args:
+        behavior: Parametry opóźnień i błędów
+        stats: Opcjonalne liczniki odpowiedzi
+
+    Returns:
+        Aplikacja Starlette
+    """
+    stats = stats or ServerStats()
+    words = " ".join(f"word{i}" for i in range(behavior.words_per_email))
+
+    async def responses(request: Request) -> Response:
+        payload = await request.json()
+        output = plan_output(
+            payload, f"Dear CEO, {words}. Best regards, Alice", behavior.sales_rounds
+        )
+        prefill = _input_tokens(payload) / 1000 * behavior.latency_per_1k_input_tokens_ms / 1000
+        decode = _output_tokens(output) / 1000 * behavior.latency_per_1k_output_tokens_ms / 1000
+        await asyncio.sleep(behavior.sample_latency() + prefill + decode)
+
+        failure = behavior.sample_failure()
+        if failure is not None:
+            stats.record(failure.status_code)
+            return failure
+
+        stats.record(200)
+        if payload.get("stream"):
+            return StreamingResponse(
+                _stream_events(payload, output, behavior), media_type="text/event-stream"
+            )
+        return JSONResponse(_response_object(payload, output))
+
+    app = Starlette(routes=[Route("/v1/responses", responses, methods=["POST"])])
+    app.state.stats = stats
+    return app
+
+
+# ============================================================================
+# MOCK SENDGRID
+# ============================================================================
+
+
+def create_sendgrid_app(behavior: MockBehavior, stats: Optional[ServerStats] = None) -> Starlette:
+    """
+    Tworzy aplikację ASGI udającą endpoint POST /v3/mail/send.
+
+    Args:
+        behavior: Parametry opóźnień i błędów
+        stats: Opcjonalne liczniki odpowiedzi
+
+    Returns:
+        Aplikacja Starlette
+    """
+    stats = stats or ServerStats()
+
+    async def mail_send(request: Request) -> Response:
+        await request.body()
+        await asyncio.sleep(behavior.sample_latency())
+
+        failure = behavior.sample_failure()
+        if failure is not None:
+            stats.record(failure.status_code)
+            return failure
+
+        stats.record(202)
+        return Response(status_code=202)
+
+    app = Starlette(routes=[Route("/v3/mail/send", mail_send, methods=["POST"])])
+    app.state.stats = stats
+    return app
+
+
+# ============================================================================
+# URUCHAMIANIE SERWERÓW
+# ============================================================================
+
+
+class BackgroundServer:
+    """
+    Uruchamia aplikację ASGI w osobnym wątku z własną pętlą zdarzeń.
+
+    Dzięki temu opóźnienia mocka nie konkurują o pętlę zdarzeń
+    z generatorem obciążenia.
+    """
+
+    def __init__(
+        self, app: Starlette, port: int, host: str = "127.0.0.1", startup_timeout: float = 10.0
+    ):
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.url = f"http://{host}:{port}"
+        self.startup_timeout = startup_timeout
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "BackgroundServer":
+        self._thread.start()
+        deadline = time.monotonic() + self.startup_timeout
+        while not self.server.started:
+            # Np. zajęty port: uvicorn kończy wątek bez ustawienia "started"
+            if not self._thread.is_alive():
+                raise RuntimeError(
+                    f"Serwer {self.url} nie wystartował (czy port jest już zajęty?)"
+                )
+            if time.monotonic() > deadline:
+                self.server.should_exit = True
+                raise RuntimeError(
+                    f"Serwer {self.url} nie wystartował w ciągu {self.startup_timeout:.0f} s"
+                )
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def add_behavior_arguments(parser: argparse.ArgumentParser, prefix: str, median_ms: float) -> None:
+    """Dodaje do parsera argumenty konfigurujące MockBehavior dla jednego serwera."""
+    parser.add_argument(f"--{prefix}-latency-ms", type=float, default=median_ms)
+    parser.add_argument(f"--{prefix}-latency-sigma", type=float, default=0.5)
+    parser.add_argument(f"--{prefix}-error-rate", type=float, default=0.0)
+    parser.add_argument(f"--{prefix}-429-rate", type=float, default=0.0)
+
+
+def behavior_from_arguments(args: argparse.Namespace, prefix: str) -> MockBehavior:
+    """Tworzy MockBehavior z argumentów dodanych przez add_behavior_arguments."""
+    prefix = prefix.replace("-", "_")
+    return MockBehavior(
+        median_latency_ms=getattr(args, f"{prefix}_latency_ms"),
+        latency_sigma=getattr(args, f"{prefix}_latency_sigma"),
+        error_rate=getattr(args, f"{prefix}_error_rate"),
+        rate_limit_rate=getattr(args, f"{prefix}_429_rate"),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock OpenAI Responses API i SendGrid")
+    parser.add_argument("--openai-port", type=int, default=8100)
+    parser.add_argument("--sendgrid-port", type=int, default=8101)
+    add_behavior_arguments(parser, "openai", 300.0)
+    add_behavior_arguments(parser, "sendgrid", 100.0)
+    args = parser.parse_args()
+
+    openai_app = create_openai_app(behavior_from_arguments(args, "openai"))
+    sendgrid_app = create_sendgrid_app(behavior_from_arguments(args, "sendgrid"))
+
+    with BackgroundServer(openai_app, args.openai_port) as openai_server:
+        with BackgroundServer(sendgrid_app, args.sendgrid_port) as sendgrid_server:
+            print(f"Mock OpenAI:   {openai_server.url}/v1")
+            print(f"Mock SendGrid: {sendgrid_server.url}")
+            print("Ctrl+C, aby zakończyć")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == "__main__":
+    main()
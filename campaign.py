@@ -0,0 +1,230 @@
+"""
+Kampanie z ograniczonym zużyciem pamięci: strumieniowy zapis wyników.
+
+Przebieg agenta zwraca RunResult, który zawiera wszystkie elementy
+rozmowy, surowe odpowiedzi modelu i wyniki narzędzi. Przy tysiącach
+potencjalnych klientów przechowywanie tych obiektów powoduje
+nieograniczony wzrost pamięci, choć potrzebujemy tylko kilku pól.
+
+Ten moduł wyciąga z każdego RunResult jedynie potrzebne pola,
+natychmiast dopisuje je do pliku JSONL i porzuca resztę.
+"""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from agents import Agent, RunResult, Runner
+
+from mail_merge import load_prospects
+from main import (
+    create_sales_agent_tools,
+    create_sales_agents,
+    create_sales_manager_with_tools,
+    send_email,
+)
+from profiling import run_main, stage
+
+# ============================================================================
+# KONFIGURACJA
+# ============================================================================
+
+# Pole identyfikujące potencjalnego klienta w rekordzie wyniku
+PROSPECT_ID_FIELD = "email"
+
+# Przebieg dla jednego potencjalnego klienta: dane klienta -> RunResult
+Pipeline = Callable[[Dict[str, str]], Awaitable[RunResult]]
+
+
+# ============================================================================
+# EKSTRAKCJA I ZAPIS WYNIKÓW
+# ============================================================================
+
+
+def extract_record(prospect_id: str, result: RunResult) -> Dict[str, Any]:
+    """
+    Wyciąga z RunResult tylko pola potrzebne do raportu kampanii.
+
+    Args:
+        prospect_id: Identyfikator potencjalnego klienta
+        result: Wynik przebiegu agenta
+
+    Returns:
+        Mały słownik gotowy do zapisu jako jedna linia JSONL
+    """
+    usage = result.context_wrapper.usage
+    return {
+        "prospect": prospect_id,
+        "status": "ok",
+        "final_output": str(result.final_output),
+        "last_agent": result.last_agent.name,
+        "requests": usage.requests,
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+    }
+
+
+class JsonlResultSink:
+    """
+    Zapisuje rekordy wyników do pliku JSONL w trybie dopisywania.
+
+    Każdy rekord jest zapisywany od razu po otrzymaniu, więc w pamięci
+    nie jest przechowywana żadna lista wyników. Plik można czytać
+    (np. `tail -f`) w trakcie trwania kampanii, a po awarii zawiera
+    wszystkie zakończone przebiegi. Zapis partiami (flush_every > 1)
+    jest opcjonalny - przyspiesza bardzo duże kampanie kosztem utraty
+    do flush_every - 1 rekordów przy awarii.
+    """
+
+    def __init__(self, path: str | Path, flush_every: int = 1):
+        """
+        Args:
+            path: Ścieżka do pliku wynikowego (.jsonl)
+            flush_every: Co ile rekordów wymuszać zapis bufora na dysk (domyślnie po każdym)
+        """
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.written = 0
+        self._handle = None
+
+    def __enter__(self) -> "JsonlResultSink":
+        self._handle = self.path.open("a", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Dopisuje jeden rekord jako linię JSON."""
+        if self._handle is None:
+            raise RuntimeError(
+                "JsonlResultSink nie jest otwarty - użyj 'with JsonlResultSink(...)'"
+            )
+        self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.written += 1
+        if self.written % self.flush_every == 0:
+            self._handle.flush()
+
+    def close(self) -> None:
+        """Zamyka plik wynikowy."""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+# ============================================================================
+# URUCHAMIANIE KAMPANII
+# ============================================================================
+
+
+async def run_campaign(
+    prospects: Iterable[Dict[str, str]],
+    pipeline: Pipeline,
+    sink: JsonlResultSink,
+    max_concurrency: int = 10,
+) -> Dict[str, int]:
+    """
+    Uruchamia przebieg dla każdego potencjalnego klienta i strumieniowo zapisuje wyniki.
+
+    Zużycie pamięci jest stałe: jednocześnie żyje co najwyżej
+    max_concurrency przebiegów, a każdy RunResult jest porzucany
+    zaraz po wyciągnięciu z niego rekordu.
+
+    Args:
+        prospects: Iterowalna kolekcja potencjalnych klientów (może być generatorem)
+        pipeline: Funkcja uruchamiająca przebieg dla jednego klienta
+        sink: Otwarty zapis wyników
+        max_concurrency: Maksymalna liczba równoczesnych przebiegów
+
+    Returns:
+        Statystyki: liczba udanych i nieudanych przebiegów (przebieg,
+        którego wyniku nie udało się zapisać, jest liczony jako nieudany)
+    """
+    stats = {"ok": 0, "error": 0}
+    pending: set[asyncio.Task] = set()
+
+    async def process(prospect: Dict[str, str]) -> None:
+        prospect_id = prospect.get(PROSPECT_ID_FIELD, "")
+        try:
+            with stage("pipeline"):
+                result = await pipeline(prospect)
+            with stage("extract_record"):
+                record = extract_record(prospect_id, result)
+            del result
+        except Exception as e:
+            record = {"prospect": prospect_id, "status": "error", "error": str(e)}
+        # Błąd zapisu nie może przerwać zadania - jego wyjątku nikt by nie odczytał
+        try:
+            with stage("write_result"):
+                sink.write(record)
+        except Exception as e:
+            print(f"❌ Nie udało się zapisać wyniku dla {prospect_id}: {e}")
+            stats["error"] += 1
+            return
+        stats[record["status"]] += 1
+
+    for prospect in prospects:
+        if len(pending) >= max_concurrency:
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        task = asyncio.create_task(process(prospect))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    if pending:
+        await asyncio.gather(*pending)
+
+    return stats
+
+
+def make_agent_pipeline(agent: Agent, message_template: str) -> Pipeline:
+    """
+    Tworzy przebieg, który uruchamia agenta z poleceniem uzupełnionym danymi klienta.
+
+    Args:
+        agent: Agent do uruchomienia (np. kierownik sprzedaży)
+        message_template: Polecenie z polami w formacie str.format, np. "... to {first_name}"
+
+    Returns:
+        Funkcja przebiegu dla run_campaign
+    """
+
+    async def pipeline(prospect: Dict[str, str]) -> RunResult:
+        return await Runner.run(agent, message_template.format(**prospect))
+
+    return pipeline
+
+
+# ============================================================================
+# DEMONSTRACJA
+# ============================================================================
+
+
+async def demo_campaign(
+    prospects_path: Optional[str] = None, output_path: str = "campaign_results.jsonl"
+) -> None:
+    """Demonstracja kampanii ze strumieniowym zapisem wyników do JSONL."""
+    print("=" * 60)
+    print("DEMONSTRACJA: Kampania ze strumieniowym zapisem wyników")
+    print("=" * 60)
+
+    sales_tools = create_sales_agent_tools(*create_sales_agents())
+    sales_tools.append(send_email)
+    sales_manager = create_sales_manager_with_tools(sales_tools)
+    pipeline = make_agent_pipeline(
+        sales_manager, "Send a cold sales email addressed to 'Dear {first_name}'"
+    )
+
+    # Każdy przebieg ma własny ślad - jeden ślad na całą kampanię rósłby bez ograniczeń
+    with JsonlResultSink(output_path) as sink:
+        prospects = load_prospects(prospects_path or "prospects.csv")
+        stats = await run_campaign(prospects, pipeline, sink)
+
+    print(f"\nUdane: {stats['ok']}, nieudane: {stats['error']}")
+    print(f"📄 Wyniki zapisane w: {output_path}\n")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_main(demo_campaign(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,208 @@
+"""
+Łączenie identycznych żądań w locie (single-flight).
+
+Gdy wielu wywołujących jednocześnie prosi o to samo - np. tę samą personę
+z tym samym poleceniem "Write a cold sales email" - każde wywołanie
+Runner.run uruchamiałoby osobne żądanie do modelu. SingleFlight wykrywa
+identyczne żądania, które są właśnie w trakcie wykonywania, i pozwala im
+współdzielić jeden przebieg: jego wynik lub strumień delt trafia do
+wszystkich oczekujących.
+
+Wyniki nie są zapamiętywane po zakończeniu przebiegu - to nie jest cache,
+tylko deduplikacja żądań trwających w tym samym czasie.
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable
+
+from agents import Agent
+
+from main import run_final_output, stream_email_deltas
+
+
+def _tool_signature(tool: Any) -> list:
+    """Nazwa i schemat parametrów narzędzia (dla narzędzi bez schematu - sama nazwa)."""
+    return [getattr(tool, "name", type(tool).__name__), getattr(tool, "params_json_schema", None)]
+
+
+def _handoff_name(handoff: Any) -> str:
+    """Nazwa narzędzia handoff (Handoff) lub nazwa agenta docelowego (Agent)."""
+    return getattr(handoff, "tool_name", None) or handoff.name
+
+
+def request_key(agent: Agent, message: str) -> str:
+    """
+    Wyznacza klucz żądania: identyczne klucze oznaczają identyczne wywołanie modelu.
+
+    Oprócz nazwy, instrukcji i modelu klucz obejmuje wszystko, co zmienia
+    wynik przebiegu: ustawienia modelu (np. temperature), narzędzia,
+    handoffy, typ wyniku i sposób obsługi wyników narzędzi.
+
+    Args:
+        agent: Agent do uruchomienia
+        message: Wiadomość wejściowa
+
+    Returns:
+        Skrót SHA-256 konfiguracji agenta oraz wiadomości
+    """
+    output_type = agent.output_type
+    payload = json.dumps(
+        {
+            "name": agent.name,
+            "instructions": str(agent.instructions),
+            "model": str(agent.model),
+            "model_settings": agent.model_settings.to_json_dict(),
+            "tools": [_tool_signature(tool) for tool in agent.tools],
+            "handoffs": [_handoff_name(handoff) for handoff in agent.handoffs],
+            "output_type": getattr(output_type, "__qualname__", str(output_type)),
+            "tool_use_behavior": str(agent.tool_use_behavior),
+            "message": message,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _SharedStream:
+    """Bufor delt jednego przebiegu strumieniowego, odczytywany przez wielu subskrybentów."""
+
+    def __init__(self) -> None:
+        self.deltas: list[str] = []
+        self.done = False
+        self.error: Exception | None = None
+        self.changed = asyncio.Condition()
+        self.subscribers = 0
+        self.producer: asyncio.Task | None = None
+
+    async def produce(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for delta in source:
+                async with self.changed:
+                    self.deltas.append(delta)
+                    self.changed.notify_all()
+        except asyncio.CancelledError:
+            # Anulowanie (np. zamknięcie usługi) przerywa przebieg, a pozostali
+            # subskrybenci dostają zwykły błąd zamiast cudzego CancelledError
+            self.error = RuntimeError("Współdzielony przebieg strumieniowy został anulowany")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self.changed:
+                self.done = True
+                self.changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        # Spóźnieni subskrybenci najpierw otrzymują delty już zbuforowane
+        position = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: position < len(self.deltas) or self.done)
+                pending = self.deltas[position:]
+                finished = self.done
+            for delta in pending:
+                yield delta
+            position += len(pending)
+            if finished and position == len(self.deltas):
+                break
+        if self.error is not None:
+            raise self.error
+
+
+class SingleFlight:
+    """
+    Współdzieli jeden przebieg między identycznymi żądaniami w locie.
+
+    Przykład:
+        flight = SingleFlight()
+        emails = await asyncio.gather(*(flight.run(agent, "Write a cold sales email")
+                                        for _ in range(100)))  # jedno wywołanie modelu
+    """
+
+    def __init__(self) -> None:
+        self._results: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, _SharedStream] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Wykonuje factory() raz dla wszystkich równoczesnych wywołań z tym samym kluczem.
+
+        Anulowanie jednego z oczekujących nie przerywa wspólnego przebiegu.
+
+        Args:
+            key: Klucz identyfikujący żądanie
+            factory: Funkcja tworząca korutynę wykonującą żądanie
+
+        Returns:
+            Wynik współdzielonego przebiegu (wyjątek trafia do wszystkich oczekujących)
+        """
+        self.calls += 1
+        task = self._results.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._results[key] = task
+            task.add_done_callback(lambda _: self._results.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def run(self, agent: Agent, message: str) -> str:
+        """Uruchamia agenta, współdzieląc przebieg z identycznymi żądaniami w locie."""
+        return await self.do(
+            ("run", request_key(agent, message)), lambda: run_final_output(agent, message)
+        )
+
+    async def stream(self, agent: Agent, message: str) -> AsyncIterator[str]:
+        """
+        Strumieniuje delty agenta, współdzieląc jeden strumień z identycznymi żądaniami.
+
+        Yields:
+            Wszystkie delty przebiegu od początku, także dla subskrybentów dołączających później
+        """
+        self.calls += 1
+        key = ("stream", request_key(agent, message))
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            shared.producer = asyncio.ensure_future(
+                shared.produce(stream_email_deltas(agent, message))
+            )
+            shared.producer.add_done_callback(lambda _: self._forget_stream(key, shared))
+        else:
+            self.coalesced += 1
+
+        shared.subscribers += 1
+        try:
+            async for delta in shared.subscribe():
+                yield delta
+        finally:
+            shared.subscribers -= 1
+            # Nikt już nie czyta - przerywamy przebieg, zamiast płacić za niepotrzebne tokeny
+            if shared.subscribers == 0 and not shared.done:
+                self._forget_stream(key, shared)
+                shared.producer.cancel()
+
+    def _forget_stream(self, key: Hashable, shared: _SharedStream) -> None:
+        # Pod tym kluczem mógł już wystartować nowy przebieg - usuwamy tylko własny
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+    async def close(self) -> None:
+        """Anuluje wszystkie trwające przebiegi (np. przy zamykaniu usługi)."""
+        tasks = list(self._results.values())
+        tasks += [shared.producer for shared in self._streams.values() if shared.producer]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def in_flight(self) -> int:
+        """Liczba unikalnych przebiegów trwających w tej chwili."""
+        return len(self._results) + len(self._streams)
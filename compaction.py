@@ -0,0 +1,203 @@
+"""
+Kompaktowanie kontekstu w wieloiteracyjnej pętli narzędzi kierownika sprzedaży.
+
+Instrukcje kierownika z handoff pozwalają wywoływać narzędzia sales_agent
+"wielokrotnie". Każda pełna wersja robocza wraca do rozmowy kierownika,
+więc liczba tokenów wejściowych (a z nią opóźnienie) rośnie z każdą
+iteracją - i cała historia trafia potem do Email Managera.
+
+Ten moduł:
+- oznacza każdą wersję roboczą identyfikatorem ([Draft <call_id>]) i zastępuje
+  wyniki narzędzi z wcześniejszych iteracji krótkimi odnośnikami
+  (filtr RunConfig.call_model_input_filter, tylko dla wejścia modelu),
+- przekazuje Email Managerowi wyłącznie pełny tekst zwycięskiej wersji:
+  kierownik podaje w handoffie tylko jej identyfikator (draft_id), a filtr
+  wejścia kopiuje treść z historii - bez przepisywania e-maila przez model.
+"""
+
+import json
+from typing import Any, Callable, Optional
+
+from agents import Agent, Handoff, RunConfig, handoff
+from agents.handoffs import HandoffInputData
+from agents.run import CallModelData, ModelInputData
+from pydantic import BaseModel, Field
+
+# Prefiks nazw narzędzi generujących wersje robocze (create_sales_agent_tools)
+SALES_TOOL_PREFIX = "sales_agent"
+
+# Ile ostatnich wyników narzędzi sprzedaży zostawić w pełnej postaci (jedna runda)
+DEFAULT_KEEP_LAST = 3
+
+# Długość fragmentu wersji roboczej zostawianego w odnośniku
+PREVIEW_CHARS = 60
+
+
+class WinningDraft(BaseModel):
+    """Argument handoffu: identyfikator zwycięskiej wersji roboczej."""
+
+    draft_id: str = Field(
+        description="The id of the single winning draft, shown as [Draft <id>] in the conversation"
+    )
+
+
+def _draft_label(call_id: Any) -> str:
+    return f"[Draft {call_id}]"
+
+
+def compact_tool_outputs(
+    items: list[Any], keep_last: int = DEFAULT_KEEP_LAST, tool_prefix: str = SALES_TOOL_PREFIX
+) -> list[Any]:
+    """
+    Zastępuje starsze wyniki narzędzi sprzedaży krótkimi odnośnikami.
+
+    Każdy wynik narzędzia sprzedaży (także pełny) zaczyna się od
+    [Draft <call_id>], dzięki czemu kierownik może wskazać zwycięzcę
+    w handoffie, nawet jeśli jego treść została już skrócona.
+    Elementy wejściowe nie są modyfikowane - zmienione wyniki są kopiami.
+
+    Args:
+        items: Elementy wejściowe modelu (format Responses API)
+        keep_last: Liczba najnowszych wyników zostawianych w pełnej postaci
+        tool_prefix: Prefiks nazw narzędzi, których wyniki są kompaktowane
+
+    Returns:
+        Nowa lista elementów wejściowych
+    """
+    tool_names = {
+        item.get("call_id"): item.get("name")
+        for item in items
+        if isinstance(item, dict) and item.get("type") == "function_call"
+    }
+    draft_positions = [
+        index
+        for index, item in enumerate(items)
+        if isinstance(item, dict)
+        and item.get("type") == "function_call_output"
+        and str(tool_names.get(item.get("call_id"), "")).startswith(tool_prefix)
+    ]
+    to_compact = set(draft_positions[: max(len(draft_positions) - keep_last, 0)])
+
+    drafts = set(draft_positions)
+    compacted = []
+    for index, item in enumerate(items):
+        if index in drafts:
+            output = str(item.get("output", ""))
+            label = _draft_label(item.get("call_id"))
+            if index in to_compact:
+                preview = " ".join(output.split())[:PREVIEW_CHARS]
+                name = tool_names.get(item.get("call_id"))
+                output = (
+                    f"{label} Earlier draft from {name} omitted ({len(output)} chars). "
+                    f"Starts with: {preview}..."
+                )
+            else:
+                output = f"{label}\n{output}"
+            item = dict(item, output=output)
+        compacted.append(item)
+    return compacted
+
+
+def compacting_run_config(keep_last: int = DEFAULT_KEEP_LAST, **kwargs: Any) -> RunConfig:
+    """
+    Tworzy RunConfig, który przed każdym wywołaniem modelu kompaktuje starsze wersje robocze.
+
+    Args:
+        keep_last: Liczba najnowszych wyników narzędzi sprzedaży w pełnej postaci
+        **kwargs: Pozostałe parametry RunConfig
+
+    Returns:
+        Konfiguracja do przekazania do Runner.run(..., run_config=...)
+    """
+
+    def input_filter(data: CallModelData) -> ModelInputData:
+        model_data = data.model_data
+        return ModelInputData(
+            input=compact_tool_outputs(model_data.input, keep_last),
+            instructions=model_data.instructions,
+        )
+
+    return RunConfig(call_model_input_filter=input_filter, **kwargs)
+
+
+def _as_dict(raw_item: Any) -> dict:
+    """Surowy element historii jako słownik (elementy SDK bywają obiektami pydantic)."""
+    if isinstance(raw_item, dict):
+        return raw_item
+    if hasattr(raw_item, "model_dump"):
+        return raw_item.model_dump(exclude_unset=True)
+    return {
+        name: getattr(raw_item, name, None)
+        for name in ("type", "name", "arguments", "call_id", "output")
+    }
+
+
+def _find_draft(data: HandoffInputData, draft_id: str) -> Optional[str]:
+    """Pełna treść wyniku narzędzia o danym call_id (historia nie jest kompaktowana)."""
+    history = data.input_history if isinstance(data.input_history, tuple) else ()
+    raw_items = list(history)
+    raw_items += [item.raw_item for item in (*data.pre_handoff_items, *data.new_items)]
+    for raw_item in reversed(raw_items):
+        raw_item = _as_dict(raw_item)
+        if raw_item.get("type") == "function_call_output" and raw_item.get("call_id") == draft_id:
+            return str(raw_item.get("output", ""))
+    return None
+
+
+def _winning_draft_only(tool_name: str) -> Callable[[HandoffInputData], HandoffInputData]:
+    """Filtr handoffu: następny agent dostaje tylko pełną treść zwycięskiej wersji."""
+
+    def input_filter(data: HandoffInputData) -> HandoffInputData:
+        for item in reversed(data.new_items):
+            raw_item = _as_dict(item.raw_item)
+            if raw_item.get("name") != tool_name:
+                continue
+            draft_id = str(json.loads(raw_item.get("arguments") or "{}").get("draft_id", ""))
+            # Model czasem przepisuje cały znacznik zamiast samego identyfikatora
+            draft_id = draft_id.strip().strip("[]").removeprefix("Draft").strip()
+            email_body = _find_draft(data, draft_id) if draft_id else None
+            if email_body:
+                return data.clone(
+                    input_history=({"role": "user", "content": email_body},),
+                    pre_handoff_items=(),
+                    new_items=(),
+                )
+            break
+        # Nieznany identyfikator - zostawiamy pełną historię, żeby nie zgubić treści
+        return data
+
+    return input_filter
+
+
+def winning_draft_handoff(email_manager: Agent) -> Handoff:
+    """
+    Tworzy handoff do Email Managera przekazujący wyłącznie zwycięską wersję roboczą.
+
+    Kierownik podaje tylko identyfikator zwycięskiej wersji (draft_id),
+    a filtr kopiuje jej pełną treść z historii przebiegu - model nie
+    generuje ponownie całego e-maila (mniej tokenów wyjściowych) i nie może
+    go zmienić. Email Manager nie widzi wcześniejszych wersji ani wywołań
+    narzędzi. Identyfikatory wersji pokazuje compacting_run_config.
+
+    Args:
+        email_manager: Agent formatujący i wysyłający e-mail
+
+    Returns:
+        Handoff do użycia w Agent(handoffs=[...])
+    """
+    tool_name = Handoff.default_tool_name(email_manager)
+
+    async def on_handoff(context: Any, draft: WinningDraft) -> None:
+        return None
+
+    return handoff(
+        email_manager,
+        tool_description_override=(
+            f"Handoff to the {email_manager.name} agent to format and send the winning email. "
+            "Pass only the id of the winning draft (shown as [Draft <id>]); "
+            "its full text is forwarded automatically."
+        ),
+        on_handoff=on_handoff,
+        input_type=WinningDraft,
+        input_filter=_winning_draft_only(tool_name),
+    )
@@ -0,0 +1,362 @@
+"""
+Tryb korespondencji seryjnej (mail merge): generuj raz, personalizuj lokalnie.
+
+Zamiast uruchamiać pełny przepływ agentów dla każdego odbiorcy, agenci
+sprzedaży tworzą jeden szablon e-maila na segment (np. "CEO", "CTO").
+Szablon zawiera pola zastępcze w postaci {{first_name}}, {{company}} itd.,
+które są wypełniane lokalnie danymi z pliku CSV lub JSONL.
+
+Liczba wywołań modelu rośnie więc z liczbą segmentów, a nie odbiorców:
+dla każdego segmentu wykonywane są 4 wywołania (3 agenty + picker).
+"""
+
+import asyncio
+import csv
+import json
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+from agents import Agent, trace
+
+from main import create_sales_agents, deliver_email, select_best_email
+from profiling import run_main, stage
+
+# ============================================================================
+# KONFIGURACJA
+# ============================================================================
+
+# Pola zastępcze mają postać {{nazwa_pola}}
+MERGE_FIELD_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Pola zastępcze wymyślone przez model, np. [Your Name] lub [Company]
+# (bez linków Markdown w postaci [tekst](adres))
+BRACKET_PLACEHOLDER_PATTERN = re.compile(r"\[[A-Z][\w .'-]{0,40}\](?!\()")
+
+# Kolumny pliku z potencjalnymi klientami, które nie są polami szablonu
+EMAIL_FIELD = "email"
+SEGMENT_FIELD = "segment"
+DEFAULT_SEGMENT = "default"
+
+# Temat używany, gdy szablon nie zaczyna się od linii "Subject: ..."
+DEFAULT_SUBJECT = "Sales email"
+
+# Funkcja wysyłająca: (adres, temat, treść) -> dowolny wynik
+Sender = Callable[[str, str, str], object]
+
+
+# ============================================================================
+# WCZYTYWANIE ODBIORCÓW
+# ============================================================================
+
+
+def load_prospects(path: str | Path) -> Iterator[Dict[str, str]]:
+    """
+    Strumieniowo wczytuje potencjalnych klientów z pliku CSV lub JSONL.
+
+    Plik jest czytany wiersz po wierszu, więc nawet bardzo duże listy
+    odbiorców nie są w całości ładowane do pamięci.
+
+    Args:
+        path: Ścieżka do pliku .csv lub .jsonl
+
+    Yields:
+        Słownik z danymi jednego odbiorcy (musi zawierać pole "email")
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    with path.open(encoding="utf-8", newline="") as handle:
+        if suffix == ".csv":
+            rows = csv.DictReader(handle)
+        elif suffix in (".jsonl", ".ndjson"):
+            rows = (json.loads(line) for line in handle if line.strip())
+        else:
+            raise ValueError(
+                f"Nieobsługiwany format pliku odbiorców: {path.suffix} (użyj .csv lub .jsonl)"
+            )
+
+        for row in rows:
+            prospect = {key: str(value) for key, value in row.items() if value is not None}
+            if not prospect.get(EMAIL_FIELD):
+                raise ValueError(f"Odbiorca bez pola '{EMAIL_FIELD}': {prospect}")
+            yield prospect
+
+
+def merge_fields(prospect: Dict[str, str]) -> list[str]:
+    """
+    Zwraca nazwy pól, których szablon może użyć dla danego odbiorcy.
+
+    Args:
+        prospect: Dane odbiorcy
+
+    Returns:
+        Posortowana lista nazw pól (bez adresu e-mail i segmentu)
+    """
+    return sorted(key for key in prospect if key not in (EMAIL_FIELD, SEGMENT_FIELD))
+
+
+# ============================================================================
+# SZABLONY
+# ============================================================================
+
+
+def build_template_prompt(message: str, fields: list[str]) -> str:
+    """
+    Rozszerza polecenie dla agentów sprzedaży o instrukcje dotyczące szablonu.
+
+    Args:
+        message: Bazowe polecenie (np. "Write a cold sales email")
+        fields: Pola zastępcze dostępne dla segmentu
+
+    Returns:
+        Polecenie wymuszające e-mail w postaci szablonu
+    """
+    placeholders = ", ".join("{{" + field + "}}" for field in fields)
+    return (
+        f"{message}\n\n"
+        "Write it as a reusable template for many recipients. "
+        f"Use only these placeholders where personal details belong: {placeholders}. "
+        "Do not invent any other placeholders and do not fill them in yourself. "
+        "Start the email with a line 'Subject: ...' followed by the body."
+    )
+
+
+def render_template(template: str, prospect: Dict[str, str]) -> str:
+    """
+    Wypełnia pola zastępcze szablonu danymi odbiorcy.
+
+    Args:
+        template: Szablon z polami {{nazwa_pola}}
+        prospect: Dane odbiorcy
+
+    Returns:
+        Spersonalizowana treść
+
+    Raises:
+        ValueError: Gdy odbiorca nie ma wartości dla któregoś z pól szablonu
+    """
+    missing = [
+        field for field in MERGE_FIELD_PATTERN.findall(template) if not prospect.get(field)
+    ]
+    if missing:
+        raise ValueError(
+            f"Brak wartości pól {sorted(set(missing))} dla odbiorcy {prospect.get(EMAIL_FIELD)}"
+        )
+    rendered = MERGE_FIELD_PATTERN.sub(lambda match: prospect[match.group(1)], template)
+    if "{{" in rendered or "}}" in rendered:
+        raise ValueError(
+            f"Niewypełnione pola zastępcze w e-mailu dla odbiorcy {prospect.get(EMAIL_FIELD)}"
+        )
+    return rendered
+
+
+def validate_template(template: str, fields: list[str]) -> None:
+    """
+    Sprawdza, czy szablon używa wyłącznie dozwolonych pól zastępczych.
+
+    Odrzucane są pola spoza listy, pola w innej postaci niż {{nazwa_pola}}
+    (np. {{First Name}}) oraz wymyślone przez model pola w nawiasach
+    kwadratowych (np. [Your Name]) - inaczej trafiłyby do odbiorców bez zmian.
+
+    Args:
+        template: Wygenerowany szablon
+        fields: Pola zastępcze dostępne dla segmentu
+
+    Raises:
+        ValueError: Gdy szablon zawiera niedozwolone lub niepoprawne pola
+    """
+    unknown = sorted(set(MERGE_FIELD_PATTERN.findall(template)) - set(fields))
+    if unknown:
+        raise ValueError(f"Szablon używa pól spoza listy {fields}: {unknown}")
+
+    remainder = MERGE_FIELD_PATTERN.sub("", template)
+    if "{{" in remainder or "}}" in remainder:
+        raise ValueError("Szablon zawiera niepoprawne pola zastępcze (dozwolone: {{nazwa_pola}})")
+
+    invented = BRACKET_PLACEHOLDER_PATTERN.findall(remainder)
+    if invented:
+        raise ValueError(f"Szablon zawiera pola wymyślone przez model: {sorted(set(invented))}")
+
+
+def split_subject(email: str) -> tuple[str, str]:
+    """
+    Oddziela temat od treści, jeśli e-mail zaczyna się od linii "Subject: ...".
+
+    Args:
+        email: Pełny tekst e-maila
+
+    Returns:
+        Tuple (temat, treść)
+    """
+    first_line, _, rest = email.strip().partition("\n")
+    if first_line.lower().startswith("subject:"):
+        return first_line.split(":", 1)[1].strip(), rest.strip()
+    return DEFAULT_SUBJECT, email.strip()
+
+
+async def generate_segment_template(
+    agent1: Agent,
+    agent2: Agent,
+    agent3: Agent,
+    picker_agent: Agent,
+    message: str,
+    fields: list[str],
+) -> str:
+    """
+    Generuje jeden szablon e-maila dla segmentu odbiorców.
+
+    Wykorzystuje ten sam proces co select_best_email (3 warianty + picker),
+    ale z poleceniem wymuszającym pola zastępcze.
+
+    Returns:
+        Najlepszy szablon e-maila
+
+    Raises:
+        ValueError: Gdy szablon zawiera niedozwolone pola (validate_template)
+    """
+    prompt = build_template_prompt(message, fields)
+    with stage("generate_template"):
+        template = await select_best_email(agent1, agent2, agent3, picker_agent, prompt)
+    validate_template(template, fields)
+    return template
+
+
+# ============================================================================
+# KORESPONDENCJA SERYJNA
+# ============================================================================
+
+
+async def run_mail_merge(
+    prospects_path: str | Path,
+    message: str,
+    agents: tuple[Agent, Agent, Agent],
+    picker_agent: Agent,
+    sender: Sender = deliver_email,
+    max_concurrent_sends: int = 10,
+) -> Dict[str, int]:
+    """
+    Generuje szablony per segment i wysyła spersonalizowane e-maile do wszystkich odbiorców.
+
+    Proces:
+    1. Odbiorcy są wczytywani strumieniowo z pliku
+    2. Przy pierwszym wystąpieniu segmentu uruchamiane jest generowanie jego szablonu
+       (kolejni odbiorcy z tego segmentu czekają na ten sam wynik)
+    3. Szablon jest wypełniany lokalnie i przekazywany do funkcji wysyłającej
+
+    Args:
+        prospects_path: Plik CSV/JSONL z odbiorcami
+        message: Bazowe polecenie dla agentów sprzedaży
+        agents: Trzech agentów sprzedaży
+        picker_agent: Agent wybierający najlepszy szablon
+        sender: Funkcja wysyłająca (domyślnie SendGrid)
+        max_concurrent_sends: Maksymalna liczba równoczesnych wysyłek
+
+    Błąd generowania szablonu segmentu lub wysyłki nie przerywa kampanii:
+    dotknięci odbiorcy są liczeni jako "failed", niezależnie od tego,
+    kiedy zakończy się dane zadanie.
+
+    Returns:
+        Statystyki: liczba segmentów, wysłanych, pominiętych i nieudanych wiadomości
+    """
+    agent1, agent2, agent3 = agents
+    templates: Dict[str, asyncio.Task] = {}
+    semaphore = asyncio.Semaphore(max_concurrent_sends)
+    stats = {"segments": 0, "sent": 0, "skipped": 0, "failed": 0}
+    failed_segments: set[str] = set()
+
+    async def personalize_and_send(
+        prospect: Dict[str, str], segment: str, template_task: asyncio.Task
+    ) -> None:
+        try:
+            template = await template_task
+        except Exception as e:
+            if segment not in failed_segments:
+                failed_segments.add(segment)
+                print(f"❌ Nie udało się wygenerować szablonu segmentu '{segment}': {e}")
+            stats["failed"] += 1
+            return
+        try:
+            with stage("render_template"):
+                subject, body = split_subject(render_template(template, prospect))
+        except ValueError as e:
+            print(f"⚠️ Pominięto odbiorcę: {e}")
+            stats["skipped"] += 1
+            return
+        async with semaphore:
+            # Wysyłka SendGrid jest blokująca - przenosimy ją do osobnego wątku
+            try:
+                with stage("send"):
+                    await asyncio.to_thread(sender, prospect[EMAIL_FIELD], subject, body)
+            except Exception as e:
+                print(f"❌ Wysyłka do {prospect[EMAIL_FIELD]} nie powiodła się: {e}")
+                stats["failed"] += 1
+                return
+        stats["sent"] += 1
+
+    with trace("Mail merge campaign"):
+        pending: set[asyncio.Task] = set()
+        for prospect in load_prospects(prospects_path):
+            segment = prospect.get(SEGMENT_FIELD) or DEFAULT_SEGMENT
+            if segment not in templates:
+                templates[segment] = asyncio.create_task(
+                    generate_segment_template(
+                        agent1, agent2, agent3, picker_agent, message, merge_fields(prospect)
+                    )
+                )
+                stats["segments"] += 1
+
+            task = asyncio.create_task(
+                personalize_and_send(prospect, segment, templates[segment])
+            )
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+            # Ograniczenie liczby oczekujących zadań, aby nie trzymać całej listy w pamięci
+            if len(pending) >= max_concurrent_sends * 10:
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+    return stats
+
+
+# ============================================================================
+# DEMONSTRACJA
+# ============================================================================
+
+
+async def demo_mail_merge(prospects_path: Optional[str] = None) -> None:
+    """Demonstracja korespondencji seryjnej dla listy odbiorców z pliku."""
+    print("=" * 60)
+    print("DEMONSTRACJA: Korespondencja seryjna (mail merge)")
+    print("=" * 60)
+
+    picker_agent = Agent(
+        name="sales_picker",
+        instructions=(
+            "You pick the best cold sales email template from the given options. "
+            "Imagine you are a customer and pick the one you are most likely to respond to. "
+            "Keep all {{placeholders}} unchanged. "
+            "Do not give an explanation; reply with the selected email only."
+        ),
+        model="gpt-4o-mini",
+    )
+
+    stats = await run_mail_merge(
+        prospects_path or "prospects.csv",
+        "Write a cold sales email addressed to the recipient by name",
+        create_sales_agents(),
+        picker_agent,
+    )
+    print(
+        f"\nSegmenty: {stats['segments']}, wysłane: {stats['sent']}, "
+        f"pominięte: {stats['skipped']}, nieudane: {stats['failed']}\n"
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_main(demo_mail_merge(sys.argv[1] if len(sys.argv) > 1 else None))
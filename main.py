@@ -12,14 +12,20 @@ Główne koncepcje:
 
 import asyncio
 import os
-from typing import Dict
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional
 
 import sendgrid
-from agents import Agent, Runner, function_tool, trace
+from agents import Agent, Handoff, Runner, function_tool, trace
 from dotenv import load_dotenv
 from openai.types.responses import ResponseTextDeltaEvent
 from sendgrid.helpers.mail import Content, Email, Mail, To
 
+from compaction import compacting_run_config, winning_draft_handoff
+from profiling import run_main, stage
+
+if TYPE_CHECKING:
+    from picker_cache import PickerCache
+
 # Ładowanie zmiennych środowiskowych z pliku .env
 load_dotenv(override=True)
 
@@ -33,6 +39,9 @@ FROM_EMAIL = os.environ.get(
     "FROM_EMAIL", "example@example.com"
 )  # Zmień na swój zweryfikowany adres
 TO_EMAIL = os.environ.get("TO_EMAIL", "example@example.com")  # Zmień na adres odbiorcy
+SENDGRID_HOST = os.environ.get(
+    "SENDGRID_HOST", "https://api.sendgrid.com"
+)  # Np. lokalny mock SendGrid w testach obciążeniowych
 
 # Weryfikacja wymaganych zmiennych środowiskowych
 if not SENDGRID_API_KEY:
@@ -56,7 +65,7 @@ def send_test_email() -> None:
 
     Oczekiwany status odpowiedzi: 202 (Accepted)
     """
-    sg = sendgrid.SendGridAPIClient(api_key=SENDGRID_API_KEY)
+    sg = sendgrid.SendGridAPIClient(api_key=SENDGRID_API_KEY, host=SENDGRID_HOST)
     from_email = Email(FROM_EMAIL)
     to_email = To(TO_EMAIL)
     content = Content("text/plain", "This is an important test email")
@@ -128,6 +137,25 @@ def create_sales_agents() -> tuple[Agent, Agent, Agent]:
 # ============================================================================
 
 
+async def stream_email_deltas(agent: Agent, message: str) -> AsyncIterator[str]:
+    """
+    Zwraca kolejne fragmenty (delty) tekstu generowanego przez agenta.
+
+    Args:
+        agent: Agent do uruchomienia
+        message: Wiadomość wejściowa dla agenta
+
+    Yields:
+        Fragmenty odpowiedzi w kolejności generowania
+    """
+    result = Runner.run_streamed(agent, input=message)
+    async for event in result.stream_events():
+        if event.type == "raw_response_event" and isinstance(
+            event.data, ResponseTextDeltaEvent
+        ):
+            yield event.data.delta
+
+
 async def demonstrate_streaming(agent: Agent, message: str) -> None:
     """
     Demonstruje strumieniowe generowanie odpowiedzi przez agenta.
@@ -140,12 +168,9 @@ async def demonstrate_streaming(agent: Agent, message: str) -> None:
         message: Wiadomość wejściowa dla agenta
     """
     print("🔄 Generowanie odpowiedzi (streaming)...\n")
-    result = Runner.run_streamed(agent, input=message)
-    async for event in result.stream_events():
-        if event.type == "raw_response_event" and isinstance(
-            event.data, ResponseTextDeltaEvent
-        ):
-            print(event.data.delta, end="", flush=True)
+    with stage("streaming"):
+        async for delta in stream_email_deltas(agent, message):
+            print(delta, end="", flush=True)
     print("\n")
 
 
@@ -154,6 +179,25 @@ async def demonstrate_streaming(agent: Agent, message: str) -> None:
 # ============================================================================
 
 
+async def run_final_output(agent: Agent, message: str) -> str:
+    """
+    Uruchamia agenta i zwraca wyłącznie jego końcową odpowiedź.
+
+    Pełny RunResult (new_items, raw_responses, wyniki narzędzi) jest
+    porzucany od razu po zakończeniu przebiegu, dzięki czemu równoległe
+    przepływy nie trzymają w pamięci danych, których nie używają.
+
+    Args:
+        agent: Agent do uruchomienia
+        message: Wiadomość wejściowa
+
+    Returns:
+        Końcowa odpowiedź agenta
+    """
+    result = await Runner.run(agent, message)
+    return result.final_output
+
+
 async def generate_parallel_emails(
     agent1: Agent, agent2: Agent, agent3: Agent, message: str
 ) -> list[str]:
@@ -174,19 +218,73 @@ async def generate_parallel_emails(
     Returns:
         Lista trzech wygenerowanych e-maili
     """
-    with trace("Parallel cold emails"):
-        results = await asyncio.gather(
-            Runner.run(agent1, message),
-            Runner.run(agent2, message),
-            Runner.run(agent3, message),
+    with trace("Parallel cold emails"), stage("generate_drafts"):
+        outputs = await asyncio.gather(
+            run_final_output(agent1, message),
+            run_final_output(agent2, message),
+            run_final_output(agent3, message),
         )
 
-    outputs = [result.final_output for result in results]
-    return outputs
+    return list(outputs)
+
+
+def create_picker_agent() -> Agent:
+    """
+    Tworzy agenta wybierającego najlepszy e-mail spośród wariantów.
+
+    Returns:
+        Agent wybierający (picker)
+    """
+    return Agent(
+        name="sales_picker",
+        instructions=(
+            "You pick the best cold sales email from the given options. "
+            "Imagine you are a customer and pick the one you are most likely to respond to. "
+            "Do not give an explanation; reply with the selected email only."
+        ),
+        model="gpt-4o-mini",
+    )
+
+
+async def pick_best_email(
+    picker_agent: Agent, drafts: list[str], picker_cache: Optional["PickerCache"] = None
+) -> str:
+    """
+    Wybiera najlepszy e-mail spośród gotowych wariantów.
+
+    Jeśli podano picker_cache, decyzja dla tego samego zbioru wariantów
+    (niezależnie od ich kolejności) jest brana z pamięci podręcznej
+    i wywołanie agenta wybierającego jest pomijane.
+
+    Args:
+        picker_agent: Agent odpowiedzialny za wybór najlepszego e-maila
+        drafts: Warianty e-maili do oceny
+        picker_cache: Opcjonalna pamięć podręczna decyzji (picker_cache.PickerCache)
+
+    Returns:
+        Najlepszy wybrany e-mail
+    """
+    with stage("pick_best"):
+        if picker_cache is not None:
+            cached = picker_cache.get(drafts, picker_agent)
+            if cached is not None:
+                return cached
+
+        emails = "Cold sales emails:\n\n" + "\n\nEmail:\n\n".join(drafts)
+        best = await run_final_output(picker_agent, emails)
+
+    if picker_cache is not None:
+        picker_cache.put(drafts, picker_agent, best)
+    return best
 
 
 async def select_best_email(
-    agent1: Agent, agent2: Agent, agent3: Agent, picker_agent: Agent, message: str
+    agent1: Agent,
+    agent2: Agent,
+    agent3: Agent,
+    picker_agent: Agent,
+    message: str,
+    picker_cache: Optional["PickerCache"] = None,
 ) -> str:
     """
     Generuje trzy warianty e-maili, a następnie wybiera najlepszy.
@@ -201,26 +299,22 @@ async def select_best_email(
         agent3: Trzeci agent sprzedaży
         picker_agent: Agent odpowiedzialny za wybór najlepszego e-maila
         message: Wiadomość wejściowa
+        picker_cache: Opcjonalna pamięć podręczna decyzji agenta wybierającego
 
     Returns:
         Najlepszy wybrany e-mail
     """
     with trace("Selection from sales people"):
         # Krok 1: Generowanie trzech wariantów równolegle
-        results = await asyncio.gather(
-            Runner.run(agent1, message),
-            Runner.run(agent2, message),
-            Runner.run(agent3, message),
-        )
-        outputs = [result.final_output for result in results]
+        with stage("generate_drafts"):
+            outputs = await asyncio.gather(
+                run_final_output(agent1, message),
+                run_final_output(agent2, message),
+                run_final_output(agent3, message),
+            )
 
-        # Krok 2: Przygotowanie wiadomości dla agenta wybierającego
-        emails = "Cold sales emails:\n\n" + "\n\nEmail:\n\n".join(outputs)
-
-        # Krok 3: Wybór najlepszego e-maila
-        best = await Runner.run(picker_agent, emails)
-
-        return best.final_output
+        # Krok 2: Wybór najlepszego e-maila (lub decyzja z pamięci podręcznej)
+        return await pick_best_email(picker_agent, list(outputs), picker_cache)
 
 
 # ============================================================================
@@ -228,6 +322,34 @@ async def select_best_email(
 # ============================================================================
 
 
+def deliver_email(
+    to_address: str, subject: str, body: str, content_type: str = "text/plain"
+) -> int:
+    """
+    Wysyła pojedynczą wiadomość przez SendGrid na wskazany adres.
+
+    Wspólna implementacja dla narzędzi agentów oraz trybu korespondencji
+    seryjnej (mail merge), który wysyła wiadomości do wielu odbiorców,
+    a nie tylko na adres TO_EMAIL.
+
+    Args:
+        to_address: Adres odbiorcy
+        subject: Temat wiadomości e-mail
+        body: Treść wiadomości
+        content_type: Typ treści ("text/plain" lub "text/html")
+
+    Returns:
+        Kod statusu HTTP odpowiedzi SendGrid
+    """
+    sg = sendgrid.SendGridAPIClient(api_key=SENDGRID_API_KEY, host=SENDGRID_HOST)
+    from_email = Email(FROM_EMAIL)
+    to_email = To(to_address)
+    content = Content(content_type, body)
+    mail = Mail(from_email, to_email, subject, content).get()
+    response = sg.client.mail.send.post(request_body=mail)
+    return response.status_code
+
+
 @function_tool
 def send_email(body: str) -> Dict[str, str]:
     """
@@ -245,12 +367,7 @@ def send_email(body: str) -> Dict[str, str]:
     Returns:
         Słownik ze statusem operacji
     """
-    sg = sendgrid.SendGridAPIClient(api_key=SENDGRID_API_KEY)
-    from_email = Email(FROM_EMAIL)
-    to_email = To(TO_EMAIL)
-    content = Content("text/plain", body)
-    mail = Mail(from_email, to_email, "Sales email", content).get()
-    sg.client.mail.send.post(request_body=mail)
+    deliver_email(TO_EMAIL, "Sales email", body)
     return {"status": "success"}
 
 
@@ -266,12 +383,7 @@ def send_html_email(subject: str, html_body: str) -> Dict[str, str]:
     Returns:
         Słownik ze statusem operacji
     """
-    sg = sendgrid.SendGridAPIClient(api_key=SENDGRID_API_KEY)
-    from_email = Email(FROM_EMAIL)
-    to_email = To(TO_EMAIL)
-    content = Content("text/html", html_body)
-    mail = Mail(from_email, to_email, subject, content).get()
-    sg.client.mail.send.post(request_body=mail)
+    deliver_email(TO_EMAIL, subject, html_body, content_type="text/html")
     return {"status": "success"}
 
 
@@ -429,7 +541,77 @@ def create_email_manager_agent() -> Agent:
     )
 
 
-def create_sales_manager_with_handoff(sales_tools: list, email_manager: Agent) -> Agent:
+async def format_email(
+    body: str, subject_writer: Agent, html_converter: Agent
+) -> tuple[str, str]:
+    """
+    Generuje temat i wersję HTML e-maila równolegle.
+
+    Oba zadania są od siebie niezależne, więc zamiast sumy czasów dwóch
+    wywołań płacimy tylko za dłuższe z nich.
+
+    Args:
+        body: Treść e-maila (tekst, może zawierać markdown)
+        subject_writer: Agent piszący temat
+        html_converter: Agent konwertujący treść na HTML
+
+    Returns:
+        Tuple (temat, treść HTML)
+    """
+    with stage("format_email"):
+        subject, html_body = await asyncio.gather(
+            run_final_output(subject_writer, body),
+            run_final_output(html_converter, body),
+        )
+    return subject, html_body
+
+
+def create_parallel_email_manager_agent() -> Agent:
+    """
+    Tworzy agenta zarządzającego e-mailami z równoległym etapem formatowania.
+
+    W odróżnieniu od create_email_manager_agent, który wywołuje narzędzia
+    subject_writer, html_converter i send_html_email jedno po drugim,
+    ten agent ma jedno narzędzie sterowane kodem: temat i HTML są generowane
+    równolegle (format_email), a następnie e-mail jest wysyłany.
+
+    Returns:
+        Agent zarządzający e-mailami (może być użyty jako handoff)
+    """
+    subject_writer, html_converter = create_email_formatting_agents()
+
+    @function_tool
+    async def format_and_send_email(body: str) -> Dict[str, str]:
+        """
+        Pisze temat, konwertuje treść na HTML i wysyła e-mail.
+
+        Args:
+            body: Treść e-maila do sformatowania i wysłania
+        """
+        subject, html_body = await format_email(body, subject_writer, html_converter)
+        await asyncio.to_thread(
+            deliver_email, TO_EMAIL, subject, html_body, content_type="text/html"
+        )
+        return {"status": "success", "subject": subject}
+
+    instructions = (
+        "You are an email formatter and sender. You receive the body of an email to be sent. "
+        "Use the format_and_send_email tool exactly once with the full email body; "
+        "it writes the subject, converts the body to HTML and sends the email."
+    )
+
+    return Agent(
+        name="Email Manager",
+        instructions=instructions,
+        tools=[format_and_send_email],
+        model="gpt-4o-mini",
+        handoff_description="Convert an email to HTML and send it",
+    )
+
+
+def create_sales_manager_with_handoff(
+    sales_tools: list, email_manager: Agent | Handoff
+) -> Agent:
     """
     Tworzy agenta kierownika sprzedaży z możliwością przekazania kontroli (handoff).
 
@@ -440,6 +622,7 @@ def create_sales_manager_with_handoff(sales_tools: list, email_manager: Agent) -
     Args:
         sales_tools: Lista narzędzi do generowania e-maili
         email_manager: Agent zarządzający formatowaniem i wysyłką
+            (lub handoff do niego, np. winning_draft_handoff z compaction.py)
 
     Returns:
         Agent kierownika z możliwością handoff
@@ -496,15 +679,7 @@ async def demo_basic_workflow() -> None:
 
     # Wybór najlepszego e-maila
     print("\n3. Wybór najlepszego e-maila:")
-    picker_agent = Agent(
-        name="sales_picker",
-        instructions=(
-            "You pick the best cold sales email from the given options. "
-            "Imagine you are a customer and pick the one you are most likely to respond to. "
-            "Do not give an explanation; reply with the selected email only."
-        ),
-        model="gpt-4o-mini",
-    )
+    picker_agent = create_picker_agent()
     best_email = await select_best_email(
         agent1, agent2, agent3, picker_agent, "Write a cold sales email"
     )
@@ -519,8 +694,9 @@ async def demo_sales_manager_with_tools() -> None:
 
     agent1, agent2, agent3 = create_sales_agents()
 
-    # Tworzenie narzędzi
-    sales_tools = create_sales_agent_tools(agent1, agent2, agent3)
+    # Tworzenie narzędzi (generowanie JSON Schema dla as_tool)
+    with stage("create_tools"):
+        sales_tools = create_sales_agent_tools(agent1, agent2, agent3)
     sales_tools.append(send_email)  # Dodanie narzędzia do wysyłki
 
     # Tworzenie agenta kierownika
@@ -530,7 +706,7 @@ async def demo_sales_manager_with_tools() -> None:
     message = "Send a cold sales email addressed to 'Dear CEO'"
     print(f"\nWiadomość: {message}\n")
 
-    with trace("Sales manager"):
+    with trace("Sales manager"), stage("sales_manager_run"):
         result = await Runner.run(sales_manager, message)
 
     print(f"\nWynik: {result.final_output}\n")
@@ -545,20 +721,24 @@ async def demo_sales_manager_with_handoff() -> None:
     agent1, agent2, agent3 = create_sales_agents()
 
     # Tworzenie narzędzi dla agentów sprzedaży
-    sales_tools = create_sales_agent_tools(agent1, agent2, agent3)
+    with stage("create_tools"):
+        sales_tools = create_sales_agent_tools(agent1, agent2, agent3)
 
-    # Tworzenie agenta zarządzającego e-mailami
-    email_manager = create_email_manager_agent()
+    # Tworzenie agenta zarządzającego e-mailami (temat i HTML generowane równolegle)
+    email_manager = create_parallel_email_manager_agent()
 
-    # Tworzenie agenta kierownika z handoff
-    sales_manager = create_sales_manager_with_handoff(sales_tools, email_manager)
+    # Tworzenie agenta kierownika z handoff - Email Manager dostaje tylko zwycięską wersję
+    sales_manager = create_sales_manager_with_handoff(
+        sales_tools, winning_draft_handoff(email_manager)
+    )
 
     # Uruchomienie agenta kierownika
     message = "Send out a cold sales email addressed to Dear CEO from Alice"
     print(f"\nWiadomość: {message}\n")
 
-    with trace("Automated SDR"):
-        result = await Runner.run(sales_manager, message)
+    # Wersje robocze z wcześniejszych iteracji trafiają do modelu jako krótkie odnośniki
+    with trace("Automated SDR"), stage("sales_manager_run"):
+        result = await Runner.run(sales_manager, message, run_config=compacting_run_config())
 
     print(f"\nWynik: {result.final_output}\n")
     print("✅ Sprawdź swoją skrzynkę e-mail!")
@@ -586,7 +766,8 @@ async def main() -> None:
     # Test konfiguracji SendGrid
     print("🔧 Testowanie konfiguracji SendGrid...")
     try:
-        send_test_email()
+        with stage("send_test_email"):
+            send_test_email()
     except Exception as e:
         print(f"❌ Błąd podczas testu SendGrid: {e}")
         print("⚠️  Kontynuowanie bez wysyłki e-maili...\n")
@@ -594,13 +775,16 @@ async def main() -> None:
     # Uruchomienie demonstracji
     try:
         # Demonstracja 1: Podstawowy przepływ
-        await demo_basic_workflow()
+        with stage("demo_basic_workflow"):
+            await demo_basic_workflow()
 
         # Demonstracja 2: Agent z narzędziami
-        # await demo_sales_manager_with_tools()  # Odkomentuj, aby uruchomić
+        # with stage("demo_sales_manager_with_tools"):  # Odkomentuj, aby uruchomić
+        #     await demo_sales_manager_with_tools()
 
         # Demonstracja 3: Agent z handoff
-        # await demo_sales_manager_with_handoff()  # Odkomentuj, aby uruchomić
+        # with stage("demo_sales_manager_with_handoff"):  # Odkomentuj, aby uruchomić
+        #     await demo_sales_manager_with_handoff()
 
         print("\n" + "=" * 60)
         print("✅ Wszystkie demonstracje zakończone!")
@@ -614,4 +798,5 @@ async def main() -> None:
 
 if __name__ == "__main__":
     # Uruchomienie głównej funkcji asynchronicznej
-    asyncio.run(main())
+    # (PROFILE_OUTPUT=profile.folded włącza tryb profilowania - zobacz profiling.py)
+    run_main(main())
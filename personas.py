@@ -0,0 +1,564 @@
+"""
+Flota person sprzedażowych z konfiguracji i wybór person przez wielorękiego bandytę.
+
+Trzy persony z main.py (INSTRUCTIONS_* i create_sales_agents) są zaszyte
+w kodzie, a każdy klient wymaga 4 wywołań modelu: 3 wersje robocze + picker.
+Ten moduł:
+
+- wczytuje dowolną liczbę person z pliku JSON (domyślnie personas.json):
+  [{"name": "...", "instructions": "...", "model": "gpt-4o-mini"}, ...]
+- dla każdego segmentu utrzymuje rozkłady Beta skuteczności person
+  (próbkowanie Thompsona), uczone na zwycięstwach w pickerze
+  i na odpowiedziach klientów, zapisywane lokalnie w pliku JSON,
+- uruchamia tylko k najlepszych person; k maleje do 1, gdy jedna persona
+  z dużym prawdopodobieństwem jest najlepsza - wtedy picker nie jest
+  potrzebny, a liczba wywołań modelu na klienta spada z 4 do 1.
+"""
+
+import asyncio
+import difflib
+import json
+import os
+import random
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
+
+from agents import Agent, trace
+
+from mail_merge import DEFAULT_SEGMENT, EMAIL_FIELD, SEGMENT_FIELD, load_prospects, split_subject
+from main import (
+    INSTRUCTIONS_CONCISE,
+    INSTRUCTIONS_ENGAGING,
+    INSTRUCTIONS_PROFESSIONAL,
+    create_picker_agent,
+    deliver_email,
+    pick_best_email,
+    run_final_output,
+)
+from picker_cache import normalize_draft
+from profiling import run_main, stage
+
+if TYPE_CHECKING:
+    from picker_cache import PickerCache
+
+# ============================================================================
+# KONFIGURACJA
+# ============================================================================
+
+# Plik z definicjami person (gdy nie istnieje, używane są persony z main.py)
+PERSONAS_PATH = os.environ.get("PERSONAS_PATH", "personas.json")
+
+# Plik ze statystykami bandyty (zwycięstwa w pickerze i odpowiedzi klientów)
+PERSONA_STATS_PATH = os.environ.get("PERSONA_STATS_PATH", "persona_stats.json")
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Pole dziennika wysyłek z unikalnym identyfikatorem wysyłki
+SEND_ID_FIELD = "send_id"
+
+
+@dataclass
+class Persona:
+    """Definicja persony sprzedażowej."""
+
+    name: str
+    instructions: str
+    model: str = DEFAULT_MODEL
+
+
+# Persony używane, gdy plik konfiguracji nie istnieje (te same co w create_sales_agents)
+DEFAULT_PERSONAS = [
+    Persona("Professional Sales Agent", INSTRUCTIONS_PROFESSIONAL),
+    Persona("Engaging Sales Agent", INSTRUCTIONS_ENGAGING),
+    Persona("Busy Sales Agent", INSTRUCTIONS_CONCISE),
+]
+
+
+# ============================================================================
+# WCZYTYWANIE PERSON
+# ============================================================================
+
+
+def load_personas(path: Optional[str | Path] = None) -> list[Persona]:
+    """
+    Wczytuje persony z pliku JSON.
+
+    Args:
+        path: Ścieżka do pliku (domyślnie PERSONAS_PATH); gdy plik nie istnieje,
+            zwracane są DEFAULT_PERSONAS
+
+    Returns:
+        Lista person
+
+    Raises:
+        ValueError: Gdy konfiguracja jest pusta, niekompletna lub nazwy się powtarzają
+    """
+    path = Path(path or PERSONAS_PATH)
+    if not path.exists():
+        return list(DEFAULT_PERSONAS)
+
+    with path.open(encoding="utf-8") as handle:
+        entries = json.load(handle)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"Plik {path} musi zawierać niepustą listę person")
+
+    personas = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get("name") or not entry.get("instructions"):
+            raise ValueError(f"Persona bez pola 'name' lub 'instructions' w {path}: {entry}")
+        personas.append(
+            Persona(entry["name"], entry["instructions"], entry.get("model") or DEFAULT_MODEL)
+        )
+
+    names = [persona.name for persona in personas]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Powtórzone nazwy person w {path}: {duplicates}")
+    return personas
+
+
+def create_persona_agents(personas: list[Persona]) -> Dict[str, Agent]:
+    """
+    Tworzy agentów sprzedaży dla person.
+
+    Args:
+        personas: Definicje person
+
+    Returns:
+        Słownik: nazwa persony -> agent
+    """
+    return {
+        persona.name: Agent(
+            name=persona.name, instructions=persona.instructions, model=persona.model
+        )
+        for persona in personas
+    }
+
+
+# ============================================================================
+# BANDYTA WIELORĘKI
+# ============================================================================
+
+
+class PersonaBandit:
+    """
+    Wybór person per segment przez próbkowanie Thompsona z rozkładami Beta.
+
+    Każda para (segment, persona) ma rozkład Beta(alpha, beta), zaczynając
+    od Beta(1, 1). Zwycięstwo w pickerze zwiększa alpha zwycięzcy i beta
+    pozostałych kandydatów; odpowiedź klienta zwiększa alpha (z wagą
+    reply_weight), a brak odpowiedzi - beta (z wagą no_reply_weight).
+
+    Przy jednej personie picker nie daje informacji, dlatego liczba person
+    maleje dopiero po min_picks decyzjach pickera w segmencie, a w części
+    przebiegów (explore_rate) nadal porównywane jest max_k person.
+
+    Przykład:
+        bandit = PersonaBandit(["A", "B", "C"], path="persona_stats.json")
+        chosen = bandit.select("CEO", max_k=3)
+        bandit.record_pick("CEO", chosen, winner)
+        bandit.save()
+    """
+
+    def __init__(
+        self,
+        personas: list[str],
+        path: Optional[str | Path] = None,
+        confidence: float = 0.9,
+        reply_weight: float = 3.0,
+        no_reply_weight: float = 0.2,
+        min_picks: int = 10,
+        explore_rate: float = 0.1,
+        samples: int = 500,
+        max_applied_replies: int = 100_000,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            personas: Nazwy person, spośród których następuje wybór
+            path: Plik JSON ze statystykami (wczytywany, jeśli istnieje)
+            confidence: Wymagane prawdopodobieństwo, że najlepsza persona jest wśród wybranych
+            reply_weight: Waga odpowiedzi klienta (w jednostkach zwycięstwa w pickerze)
+            no_reply_weight: Waga braku odpowiedzi
+            min_picks: Liczba decyzji pickera w segmencie przed zmniejszeniem liczby person
+            explore_rate: Odsetek przebiegów porównujących max_k person mimo pewności
+            samples: Liczba losowań przy szacowaniu prawdopodobieństw
+            max_applied_replies: Ile identyfikatorów uwzględnionych wysyłek pamiętać
+                (najstarsze są zapominane - starsze dzienniki należy archiwizować)
+            seed: Ziarno generatora (dla powtarzalnych testów)
+        """
+        if not personas:
+            raise ValueError("PersonaBandit wymaga co najmniej jednej persony")
+        if not 0 < confidence < 1:
+            raise ValueError("Parametr 'confidence' musi należeć do przedziału (0, 1)")
+        self.personas = list(personas)
+        self.path = Path(path) if path else None
+        self.confidence = confidence
+        self.reply_weight = reply_weight
+        self.no_reply_weight = no_reply_weight
+        self.min_picks = min_picks
+        self.explore_rate = explore_rate
+        self.samples = samples
+        self.max_applied_replies = max_applied_replies
+        self._random = random.Random(seed)
+        # segment -> persona -> [alpha, beta]
+        self._arms: Dict[str, Dict[str, list[float]]] = {}
+        # segment -> liczba zapisanych decyzji pickera
+        self._picks: Dict[str, int] = {}
+        # send_id wyników wysyłek już uwzględnionych w statystykach (w kolejności dodania)
+        self._applied_replies: Dict[str, None] = {}
+
+        if self.path and self.path.exists():
+            self.load()
+
+    def _arm(self, segment: str, persona: str) -> list[float]:
+        return self._arms.setdefault(segment, {}).setdefault(persona, [1.0, 1.0])
+
+    def _draw(self, segment: str) -> Dict[str, float]:
+        return {
+            persona: self._random.betavariate(*self._arm(segment, persona))
+            for persona in self.personas
+        }
+
+    def win_probabilities(self, segment: str) -> Dict[str, float]:
+        """Szacuje (Monte Carlo) prawdopodobieństwo, że dana persona jest najlepsza."""
+        wins = dict.fromkeys(self.personas, 0)
+        for _ in range(self.samples):
+            draw = self._draw(segment)
+            wins[max(draw, key=draw.get)] += 1
+        return {persona: count / self.samples for persona, count in wins.items()}
+
+    def select(self, segment: str, max_k: int = 3) -> list[str]:
+        """
+        Wybiera persony do uruchomienia dla klienta z danego segmentu.
+
+        Liczba person k to najmniejsza liczba najlepszych person, których
+        łączne prawdopodobieństwo bycia najlepszą osiąga `confidence`
+        (ograniczona przez max_k). Przed min_picks decyzjami pickera i w części
+        przebiegów (explore_rate) k = max_k. Same persony są wybierane jednym
+        losowaniem Thompsona, więc słabsze persony nadal są czasem sprawdzane.
+
+        Args:
+            segment: Segment klienta
+            max_k: Maksymalna liczba person
+
+        Returns:
+            Nazwy wybranych person (od najwyżej ocenionej w losowaniu)
+        """
+        k = max_k
+        learned = self._picks.get(segment, 0) >= self.min_picks
+        if learned and self._random.random() >= self.explore_rate:
+            probabilities = sorted(self.win_probabilities(segment).values(), reverse=True)
+            k, covered = 0, 0.0
+            for probability in probabilities:
+                k += 1
+                covered += probability
+                if covered >= self.confidence:
+                    break
+        k = max(1, min(k, max_k))
+
+        draw = self._draw(segment)
+        return sorted(draw, key=draw.get, reverse=True)[:k]
+
+    def record_pick(self, segment: str, candidates: list[str], winner: str) -> None:
+        """Zapisuje decyzję pickera: zwycięzca zyskuje, pozostali kandydaci tracą."""
+        if len(candidates) < 2:
+            return
+        self._picks[segment] = self._picks.get(segment, 0) + 1
+        for persona in candidates:
+            arm = self._arm(segment, persona)
+            if persona == winner:
+                arm[0] += 1
+            else:
+                arm[1] += 1
+
+    def record_reply(
+        self, segment: str, persona: str, replied: bool, send_id: Optional[str] = None
+    ) -> bool:
+        """
+        Zapisuje wynik wysyłki: odpowiedź klienta lub jej brak.
+
+        Gdy podano send_id, wynik danej wysyłki jest uwzględniany tylko raz -
+        także między uruchomieniami (identyfikatory są zapisywane razem
+        ze statystykami), więc ten sam dziennik można wczytywać wielokrotnie,
+        a ponowna wysyłka do tego samego klienta ma własny wynik.
+
+        Returns:
+            True, jeśli wynik został uwzględniony; False dla duplikatu
+        """
+        if send_id is not None:
+            if send_id in self._applied_replies:
+                return False
+            self._applied_replies[send_id] = None
+            while len(self._applied_replies) > self.max_applied_replies:
+                del self._applied_replies[next(iter(self._applied_replies))]
+        arm = self._arm(segment, persona)
+        if replied:
+            arm[0] += self.reply_weight
+        else:
+            arm[1] += self.no_reply_weight
+        return True
+
+    def stats(self, segment: str) -> Dict[str, Dict[str, float]]:
+        """Zwraca parametry i średnią skuteczność person w segmencie."""
+        result = {}
+        for persona in self.personas:
+            alpha, beta = self._arm(segment, persona)
+            mean = round(alpha / (alpha + beta), 4)
+            result[persona] = {"alpha": alpha, "beta": beta, "mean": mean}
+        return result
+
+    def save(self) -> None:
+        """Zapisuje statystyki do pliku JSON (atomowo - przez plik tymczasowy)."""
+        if self.path is None:
+            raise ValueError("PersonaBandit nie ma ustawionej ścieżki 'path'")
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "arms": self._arms,
+                    "picks": self._picks,
+                    "applied_replies": list(self._applied_replies),
+                },
+                handle,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> None:
+        """Wczytuje statystyki z pliku JSON (także dla person spoza bieżącej konfiguracji)."""
+        if self.path is None:
+            raise ValueError("PersonaBandit nie ma ustawionej ścieżki 'path'")
+        with self.path.open(encoding="utf-8") as handle:
+            data = json.load(handle)
+        self._arms = data.get("arms", {})
+        self._picks = data.get("picks", {})
+        # Starsze pliki zawierały pary [email, persona] - nie są identyfikatorami wysyłek
+        self._applied_replies = dict.fromkeys(
+            key for key in data.get("applied_replies", []) if isinstance(key, str)
+        )
+
+
+def apply_reply_outcomes(bandit: PersonaBandit, path: str | Path) -> int:
+    """
+    Uczy bandytę na wynikach wysyłek zapisanych w pliku CSV lub JSONL.
+
+    Każdy wiersz musi zawierać pola email, segment i persona oraz pole
+    replied (true/false, 1/0, yes/no) - np. dziennik wysyłek uzupełniony
+    o odpowiedzi. Wiersze bez pola replied (wynik jeszcze nieznany) są
+    pomijane. Wyniki z polem send_id (dziennik demo_persona_fleet) już
+    uwzględnione wcześniej nie są liczone ponownie - plik można wczytywać
+    wielokrotnie; wiersze bez send_id są liczone przy każdym wczytaniu.
+
+    Args:
+        bandit: Bandyta do aktualizacji
+        path: Plik z wynikami
+
+    Returns:
+        Liczba nowo uwzględnionych wyników
+    """
+    count = 0
+    for row in load_prospects(path):
+        if not row.get("persona"):
+            raise ValueError(f"Wynik wysyłki bez pola 'persona': {row}")
+        if not row.get("replied", "").strip():
+            continue
+        replied = row["replied"].strip().lower() in ("1", "true", "yes")
+        segment = row.get(SEGMENT_FIELD) or DEFAULT_SEGMENT
+        send_id = row.get(SEND_ID_FIELD) or None
+        if bandit.record_reply(segment, row["persona"], replied, send_id=send_id):
+            count += 1
+    return count
+
+
+# ============================================================================
+# WYBÓR E-MAILA
+# ============================================================================
+
+
+@dataclass
+class FleetSelection:
+    """Wynik wyboru e-maila przez flotę person."""
+
+    email: str
+    persona: str
+    candidates: list[str]
+
+    @property
+    def model_calls(self) -> int:
+        """Liczba wywołań modelu (wersje robocze + picker, jeśli kandydatów było kilku)."""
+        return len(self.candidates) + (1 if len(self.candidates) > 1 else 0)
+
+
+def identify_winner(best: str, drafts: Dict[str, str]) -> str:
+    """
+    Ustala, której personie odpowiada e-mail wybrany przez picker.
+
+    Picker zwraca tekst wybranego e-maila, czasem z drobnymi zmianami,
+    więc przy braku dokładnej zgodności wybierana jest najbardziej podobna wersja.
+
+    Args:
+        best: E-mail zwrócony przez picker
+        drafts: Słownik: persona -> wersja robocza
+
+    Returns:
+        Nazwa persony
+    """
+    normalized = normalize_draft(best)
+    for persona, draft in drafts.items():
+        if normalize_draft(draft) == normalized:
+            return persona
+    return max(
+        drafts,
+        key=lambda persona: difflib.SequenceMatcher(
+            None, normalize_draft(drafts[persona]), normalized
+        ).ratio(),
+    )
+
+
+async def select_best_email_from_fleet(
+    agents: Dict[str, Agent],
+    picker_agent: Agent,
+    message: str,
+    bandit: PersonaBandit,
+    segment: str = DEFAULT_SEGMENT,
+    max_k: int = 3,
+    picker_cache: Optional["PickerCache"] = None,
+) -> FleetSelection:
+    """
+    Generuje wersje robocze tylko dla person wybranych przez bandytę i wybiera najlepszą.
+
+    Gdy bandyta wybierze jedną personę, jej e-mail jest wynikiem bez
+    wywołania pickera. W przeciwnym razie picker wybiera najlepszą wersję,
+    a jego decyzja trafia do statystyk bandyty.
+
+    Args:
+        agents: Słownik: nazwa persony -> agent (create_persona_agents)
+        picker_agent: Agent wybierający najlepszy e-mail
+        message: Wiadomość wejściowa
+        bandit: Bandyta wybierający persony
+        segment: Segment klienta
+        max_k: Maksymalna liczba person uruchamianych dla klienta
+        picker_cache: Opcjonalna pamięć podręczna decyzji agenta wybierającego
+
+    Returns:
+        Wybrany e-mail, zwycięska persona i lista kandydatów
+    """
+    with trace("Selection from persona fleet"):
+        with stage("select_personas"):
+            candidates = bandit.select(segment, max_k)
+
+        with stage("generate_drafts"):
+            outputs = await asyncio.gather(
+                *(run_final_output(agents[persona], message) for persona in candidates)
+            )
+        drafts = dict(zip(candidates, outputs))
+
+        if len(candidates) == 1:
+            return FleetSelection(outputs[0], candidates[0], candidates)
+
+        best = await pick_best_email(picker_agent, list(outputs), picker_cache)
+        winner = identify_winner(best, drafts)
+        bandit.record_pick(segment, candidates, winner)
+        return FleetSelection(best, winner, candidates)
+
+
+# ============================================================================
+# DEMONSTRACJA
+# ============================================================================
+
+
+async def demo_persona_fleet(
+    prospects_path: Optional[str] = None,
+    replies_path: Optional[str] = None,
+    sends_path: str = "persona_sends.jsonl",
+    max_concurrency: int = 10,
+) -> None:
+    """
+    Demonstracja floty person: e-mail dla każdego klienta, persony wybierane przez bandytę.
+
+    Dziennik wysyłek (send_id, email, segment, persona) jest dopisywany
+    do sends_path; po uzupełnieniu go o pole replied można go podawać jako
+    replies_path przy kolejnych uruchomieniach - każdy wynik jest
+    uwzględniany tylko raz. Błąd generowania lub wysyłki dla jednego
+    klienta nie przerywa demonstracji, a statystyki bandyty są zapisywane
+    także po przerwaniu.
+    """
+    print("=" * 60)
+    print("DEMONSTRACJA: Flota person z wyborem przez bandytę")
+    print("=" * 60)
+
+    personas = load_personas()
+    agents = create_persona_agents(personas)
+    bandit = PersonaBandit(list(agents), path=PERSONA_STATS_PATH)
+    picker_agent = create_picker_agent()
+    stats = {"sent": 0, "failed": 0, "model_calls": 0}
+
+    async def process(prospect: Dict[str, str], sends) -> None:
+        segment = prospect.get(SEGMENT_FIELD) or DEFAULT_SEGMENT
+        message = (
+            "Write a cold sales email addressed to "
+            f"{prospect.get('first_name') or 'the recipient'}. "
+            "Start the email with a line 'Subject: ...' followed by the body."
+        )
+        try:
+            selection = await select_best_email_from_fleet(
+                agents, picker_agent, message, bandit, segment
+            )
+            stats["model_calls"] += selection.model_calls
+            subject, body = split_subject(selection.email)
+            # Wysyłka SendGrid jest blokująca - przenosimy ją do osobnego wątku
+            with stage("send"):
+                await asyncio.to_thread(deliver_email, prospect[EMAIL_FIELD], subject, body)
+        except Exception as e:
+            print(f"❌ E-mail do {prospect[EMAIL_FIELD]} nie został wysłany: {e}")
+            stats["failed"] += 1
+            return
+
+        record = {
+            SEND_ID_FIELD: uuid.uuid4().hex,
+            "email": prospect[EMAIL_FIELD],
+            "segment": segment,
+            "persona": selection.persona,
+        }
+        sends.write(json.dumps(record, ensure_ascii=False) + "\n")
+        stats["sent"] += 1
+
+    try:
+        if replies_path:
+            print(f"Uwzględnione wyniki wysyłek: {apply_reply_outcomes(bandit, replies_path)}")
+
+        pending: set[asyncio.Task] = set()
+        with open(sends_path, "a", encoding="utf-8") as sends:
+            for prospect in load_prospects(prospects_path or "prospects.csv"):
+                if len(pending) >= max_concurrency:
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                task = asyncio.create_task(process(prospect, sends))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            if pending:
+                await asyncio.gather(*pending)
+    finally:
+        bandit.save()
+
+    prospects = stats["sent"] + stats["failed"]
+    if prospects:
+        print(
+            f"\nKlienci: {prospects}, wysłane: {stats['sent']}, nieudane: {stats['failed']}, "
+            f"wywołania modelu na klienta: {stats['model_calls'] / prospects:.2f}"
+        )
+    print(f"📊 Statystyki person zapisane w: {PERSONA_STATS_PATH}\n")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_main(
+        demo_persona_fleet(
+            sys.argv[1] if len(sys.argv) > 1 else None,
+            sys.argv[2] if len(sys.argv) > 2 else None,
+        )
+    )
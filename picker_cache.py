@@ -0,0 +1,129 @@
+"""
+Pamięć podręczna decyzji agenta wybierającego (picker).
+
+Gdy warianty e-maili pochodzą z pamięci podręcznej lub powtarzają się
+między segmentami (a także przy ponowieniach dla tego samego klienta),
+select_best_email płaciłby za kolejne wywołanie picker_agent dla zbioru,
+który był już oceniany. PickerCache zapamiętuje decyzję pod kluczem
+niezależnym od kolejności wariantów, uwzględniającym też instrukcje
+i model agenta wybierającego.
+
+Wpisy są usuwane według zasady LRU, a całość można zapisać do pliku JSON
+i wczytać przy kolejnym uruchomieniu.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from agents import Agent
+
+
+def normalize_draft(draft: str) -> str:
+    """Normalizuje wariant: usuwa nadmiarowe białe znaki, które nie zmieniają treści."""
+    return " ".join(draft.split())
+
+
+def candidate_set_key(drafts: list[str], picker_agent: Agent) -> str:
+    """
+    Wyznacza klucz zbioru wariantów niezależny od ich kolejności.
+
+    Args:
+        drafts: Warianty e-maili
+        picker_agent: Agent wybierający (jego instrukcje i model są częścią klucza)
+
+    Returns:
+        Skrót SHA-256
+    """
+    payload = json.dumps(
+        {
+            "drafts": sorted(normalize_draft(draft) for draft in drafts),
+            "instructions": str(picker_agent.instructions),
+            "model": str(picker_agent.model),
+        },
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PickerCache:
+    """
+    Pamięć podręczna LRU decyzji agenta wybierającego z opcjonalnym zapisem na dysk.
+
+    Przykład:
+        cache = PickerCache(max_entries=10_000, path="picker_cache.json")
+        best = await select_best_email(a1, a2, a3, picker, message, picker_cache=cache)
+        cache.save()
+    """
+
+    def __init__(self, max_entries: int = 10_000, path: Optional[str | Path] = None):
+        """
+        Args:
+            max_entries: Maksymalna liczba zapamiętanych decyzji
+            path: Plik JSON do trwałego przechowywania (wczytywany, jeśli istnieje)
+        """
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+        if self.path and self.path.exists():
+            self.load()
+
+    def get(self, drafts: list[str], picker_agent: Agent) -> Optional[str]:
+        """Zwraca zapamiętaną decyzję dla zbioru wariantów lub None."""
+        key = candidate_set_key(drafts, picker_agent)
+        best = self._entries.get(key)
+        if best is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return best
+
+    def put(self, drafts: list[str], picker_agent: Agent, best: str) -> None:
+        """Zapamiętuje decyzję, usuwając najdawniej używane wpisy ponad limit."""
+        key = candidate_set_key(drafts, picker_agent)
+        self._entries[key] = best
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """Odsetek trafień wśród wszystkich zapytań (0.0, gdy nie było zapytań)."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Zwraca statystyki do raportów i endpointu /health."""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    def save(self) -> None:
+        """Zapisuje wpisy do pliku JSON (atomowo - przez plik tymczasowy)."""
+        if self.path is None:
+            raise ValueError("PickerCache nie ma ustawionej ścieżki 'path'")
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(list(self._entries.items()), handle, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> None:
+        """Wczytuje wpisy z pliku JSON (w kolejności od najdawniej używanych)."""
+        if self.path is None:
+            raise ValueError("PickerCache nie ma ustawionej ścieżki 'path'")
+        with self.path.open(encoding="utf-8") as handle:
+            entries = json.load(handle)
+        self._entries = OrderedDict(entries[-self.max_entries :] if self.max_entries else [])
@@ -0,0 +1,307 @@
+"""
+Wbudowany tryb profilowania: czas CPU vs oczekiwanie na I/O dla każdego etapu.
+
+Część czasu każdego przebiegu to praca CPU w naszym procesie: walidacja
+pydantic, generowanie JSON Schema dla function_tool i as_tool, budowanie
+tekstów w select_best_email, obsługa śladów (trace). Ten moduł pozwala
+zmierzyć ją bez zewnętrznych narzędzi:
+
+- etapy oznacza się przez `with stage("nazwa"):` (gdy profilowanie jest
+  wyłączone, to praktycznie darmowa operacja),
+- czas CPU jest przypisywany do etapu, w którego kontekście wykonywał się
+  dany krok pętli zdarzeń - także w zadaniach utworzonych przez
+  asyncio.gather wewnątrz etapu (zmienne kontekstowe są dziedziczone),
+- praca przeniesiona do wątków przez asyncio.to_thread (np. wysyłki
+  SendGrid) jest mierzona w tych wątkach i przypisywana do etapu, który
+  ją zlecił (osobna kolumna "wątki"), a nie liczona jako oczekiwanie,
+- CPU pozostałych wątków procesu (np. eksport śladów SDK w tle, sam
+  wątek próbkujący) nie ma etapu - raport podaje go w podsumowaniu,
+- wątek próbkujący zbiera stosy wywołań w formacie "collapsed stacks",
+  zgodnym z flamegraph.pl, speedscope i inferno.
+
+Włączenie dla demonstracji i kampanii: zmienna środowiskowa
+PROFILE_OUTPUT=profile.folded (zobacz run_main).
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Dict, Iterator, Optional, Tuple
+
+# Ścieżka etapów aktywnych w bieżącym kontekście, np. ("demo_basic_workflow", "pick_best")
+_STAGE: contextvars.ContextVar[Tuple[str, ...]] = contextvars.ContextVar(
+    "profiling_stage", default=()
+)
+
+# Nazwa "etapu" dla pracy CPU wykonanej poza oznaczonymi etapami
+UNSTAGED = "(poza etapami)"
+
+# Aktualnie włączony profiler (jeden na proces)
+_active: Optional["Profiler"] = None
+
+# Stan wątku: czas CPU od ostatniego punktu kontrolnego i czy trwa krok pętli zdarzeń
+_thread_state = threading.local()
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Oznacza etap przebiegu na potrzeby profilowania.
+
+    Działa zarówno w kodzie synchronicznym, jak i w korutynach (blok może
+    zawierać await). Gdy profilowanie nie jest włączone, nie mierzy niczego.
+
+    Args:
+        name: Nazwa etapu (etapy mogą być zagnieżdżone)
+    """
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+
+    outer = _STAGE.get()
+    path = outer + (name,)
+    profiler._checkpoint(outer)
+    token = _STAGE.set(path)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler._add_wall(path, time.perf_counter() - start)
+        profiler._checkpoint(path)
+        _STAGE.reset(token)
+        if not getattr(_thread_state, "in_step", False) and not outer:
+            # Poza pętlą zdarzeń nie przypisujemy CPU między etapami najwyższego poziomu
+            _thread_state.cpu_start = None
+
+
+class Profiler:
+    """
+    Profiler etapów: czas ściany, czas CPU i próbki stosów.
+
+    Przykład:
+        with Profiler() as profiler:
+            asyncio.run(main())
+        profiler.print_report()
+        profiler.write_flamegraph("profile.folded")
+    """
+
+    def __init__(self, sample_interval: float = 0.005):
+        """
+        Args:
+            sample_interval: Odstęp między próbkami stosu (sekundy); 0 wyłącza próbkowanie
+        """
+        self.sample_interval = sample_interval
+        self.calls: Counter = Counter()
+        self.wall: Dict[Tuple[str, ...], float] = {}
+        self.cpu: Dict[Tuple[str, ...], float] = {}
+        self.thread_cpu: Dict[Tuple[str, ...], float] = {}
+        self.process_cpu = 0.0
+        self.samples: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._original_run = None
+        self._original_to_thread = None
+        self._process_start = 0.0
+
+    # ------------------------------------------------------------------
+    # Włączanie i wyłączanie
+    # ------------------------------------------------------------------
+
+    def __enter__(self) -> "Profiler":
+        global _active
+        if _active is not None:
+            raise RuntimeError("Profiler jest już włączony w tym procesie")
+        _active = self
+
+        # Każdy krok zadania asyncio to wywołanie Handle._run w kontekście tego zadania
+        self._original_run = original_run = asyncio.events.Handle._run
+        profiler = self
+
+        def timed_run(handle: asyncio.events.Handle) -> None:
+            _thread_state.cpu_start = time.thread_time()
+            _thread_state.in_step = True
+            try:
+                original_run(handle)
+            finally:
+                # Etapy otwierane i zamykane wewnątrz kroku rozliczają się same
+                # (stage() wywołuje _checkpoint); reszta kroku trafia do etapu
+                # aktywnego na jego końcu
+                context = handle._context
+                profiler._checkpoint(context.get(_STAGE, ()) if context is not None else ())
+                _thread_state.in_step = False
+                _thread_state.cpu_start = None
+
+        asyncio.events.Handle._run = timed_run
+
+        # asyncio.to_thread kopiuje kontekst, ale CPU wątku roboczego mierzymy osobno
+        self._original_to_thread = original_to_thread = asyncio.to_thread
+
+        async def timed_to_thread(func, /, *args, **kwargs):
+            path = _STAGE.get()
+
+            def timed(*args, **kwargs):
+                start = time.thread_time()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profiler._add_thread_cpu(path, time.thread_time() - start)
+
+            return await original_to_thread(timed, *args, **kwargs)
+
+        asyncio.to_thread = timed_to_thread
+        self._process_start = time.process_time()
+
+        if self.sample_interval > 0:
+            self._sampler = threading.Thread(
+                target=self._sample, args=(threading.get_ident(),), daemon=True
+            )
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _active
+        self.process_cpu = time.process_time() - self._process_start
+        asyncio.events.Handle._run = self._original_run
+        asyncio.to_thread = self._original_to_thread
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        _active = None
+
+    # ------------------------------------------------------------------
+    # Zbieranie danych
+    # ------------------------------------------------------------------
+
+    def _add_wall(self, path: Tuple[str, ...], seconds: float) -> None:
+        with self._lock:
+            self.calls[path] += 1
+            self.wall[path] = self.wall.get(path, 0.0) + seconds
+
+    def _checkpoint(self, path: Tuple[str, ...]) -> None:
+        """Przypisuje CPU zużyte od ostatniego punktu kontrolnego do etapu `path`."""
+        now = time.thread_time()
+        start = getattr(_thread_state, "cpu_start", None)
+        if start is not None:
+            self._add_cpu(path, now - start)
+        _thread_state.cpu_start = now
+
+    def _add_cpu(self, path: Tuple[str, ...], seconds: float) -> None:
+        path = path or (UNSTAGED,)
+        with self._lock:
+            self.cpu[path] = self.cpu.get(path, 0.0) + seconds
+
+    def _add_thread_cpu(self, path: Tuple[str, ...], seconds: float) -> None:
+        path = path or (UNSTAGED,)
+        with self._lock:
+            self.thread_cpu[path] = self.thread_cpu.get(path, 0.0) + seconds
+
+    def _sample(self, thread_id: int) -> None:
+        while not self._stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                frames.append(f"{code.co_name} ({filename})".replace(";", ":"))
+                frame = frame.f_back
+            if frames:
+                self.samples[";".join(reversed(frames))] += 1
+
+    # ------------------------------------------------------------------
+    # Raporty
+    # ------------------------------------------------------------------
+
+    def inclusive_cpu(self, path: Tuple[str, ...], source: Optional[Dict] = None) -> float:
+        """Czas CPU etapu łącznie z etapami zagnieżdżonymi (domyślnie CPU pętli zdarzeń)."""
+        source = self.cpu if source is None else source
+        return sum(
+            seconds for cpu_path, seconds in source.items() if cpu_path[: len(path)] == path
+        )
+
+    def rows(self) -> list[Dict]:
+        """
+        Zwraca wiersze raportu: dla każdego etapu liczba wywołań, czas ściany,
+        CPU pętli zdarzeń, CPU wątków asyncio.to_thread i oczekiwanie
+        (ściana - oba czasy CPU), posortowane według ścieżki etapu.
+        """
+        paths = sorted(set(self.wall) | set(self.cpu) | set(self.thread_cpu))
+        rows = []
+        for path in paths:
+            cpu = self.inclusive_cpu(path)
+            thread_cpu = self.inclusive_cpu(path, self.thread_cpu)
+            wall = self.wall.get(path, cpu + thread_cpu)
+            rows.append(
+                {
+                    "stage": "/".join(path),
+                    "depth": len(path) - 1,
+                    "calls": self.calls.get(path, 0),
+                    "wall": wall,
+                    "cpu": cpu,
+                    "thread_cpu": thread_cpu,
+                    "await": max(wall - cpu - thread_cpu, 0.0),
+                }
+            )
+        return rows
+
+    @property
+    def other_threads_cpu(self) -> float:
+        """CPU procesu poza krokami pętli zdarzeń i asyncio.to_thread (np. eksport śladów)."""
+        measured = sum(self.cpu.values()) + sum(self.thread_cpu.values())
+        return max(self.process_cpu - measured, 0.0)
+
+    def print_report(self) -> None:
+        """Drukuje tabelę czasu CPU i oczekiwania dla każdego etapu."""
+        print("\n" + "=" * 88)
+        print(
+            f"{'Etap':<36} {'wywołania':>9} {'ściana[s]':>10} {'CPU[s]':>9} "
+            f"{'wątki[s]':>9} {'I/O[s]':>9}"
+        )
+        print("-" * 88)
+        for row in self.rows():
+            name = "  " * row["depth"] + row["stage"].split("/")[-1]
+            print(
+                f"{name[:36]:<36} {row['calls']:>9} {row['wall']:>10.3f} "
+                f"{row['cpu']:>9.3f} {row['thread_cpu']:>9.3f} {row['await']:>9.3f}"
+            )
+        print("=" * 88)
+        print("CPU - pętla zdarzeń; wątki - praca zlecona przez asyncio.to_thread.")
+        print(
+            f"CPU pozostałych wątków procesu (bez etapu, np. eksport śladów): "
+            f"{self.other_threads_cpu:.3f} s"
+        )
+        print("Czasy sumują się po wszystkich (także równoległych) wywołaniach etapu.\n")
+
+    def write_flamegraph(self, path: str) -> None:
+        """Zapisuje próbki stosów w formacie "collapsed stacks" (stos liczba)."""
+        with open(path, "w", encoding="utf-8") as handle:
+            for stack, count in self.samples.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+def run_main(main: Awaitable) -> None:
+    """
+    Uruchamia korutynę główną, opcjonalnie w trybie profilowania.
+
+    Gdy ustawiona jest zmienna środowiskowa PROFILE_OUTPUT, po zakończeniu
+    drukowany jest raport etapów, a próbki stosów trafiają do wskazanego pliku.
+
+    Args:
+        main: Korutyna do uruchomienia (np. main() z main.py)
+    """
+    output = os.environ.get("PROFILE_OUTPUT")
+    if not output:
+        asyncio.run(main)
+        return
+
+    with Profiler() as profiler:
+        asyncio.run(main)
+    profiler.print_report()
+    profiler.write_flamegraph(output)
+    print(f"🔥 Próbki stosów (flamegraph): {output}")
@@ -0,0 +1,374 @@
+"""
+Usługa HTTP (ASGI) udostępniająca generowanie e-maili wielu klientom jednocześnie.
+
+Endpointy:
+- POST /emails/stream     - strumieniowanie wersji roboczej e-maila (SSE)
+- POST /emails/best       - trzy warianty + wybór najlepszego (select_best_email)
+- POST /managers/tools    - agent kierownik z narzędziami (wysyła e-mail)
+- POST /managers/handoff  - agent kierownik z handoff do Email Managera
+- GET  /health            - stan usługi
+
+Agenci i pula połączeń klienta OpenAI są tworzeni raz przy starcie
+i współdzieleni przez wszystkie żądania. Identyczne żądania w locie
+współdzielą jeden przebieg (coalescing.SingleFlight). Każdy klient (adres
+połączenia) może mieć ograniczoną liczbę równoczesnych żądań, a łączną liczbę
+przebiegów wywołujących model ogranicza wspólny semafor.
+
+Uruchomienie:
+    python service.py          # lub: uvicorn service:app --port 8000
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+from typing import AsyncIterator, Callable, Dict, Optional
+
+import httpx
+import uvicorn
+from agents import Runner, function_tool, set_default_openai_client
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.types import Receive, Scope, Send
+
+from coalescing import SingleFlight
+from compaction import compacting_run_config, winning_draft_handoff
+from main import (
+    TO_EMAIL,
+    create_parallel_email_manager_agent,
+    create_picker_agent,
+    create_sales_agent_tools,
+    create_sales_agents,
+    create_sales_manager_with_handoff,
+    create_sales_manager_with_tools,
+    deliver_email,
+    select_best_email,
+)
+from picker_cache import PickerCache
+
+# ============================================================================
+# KONFIGURACJA
+# ============================================================================
+
+SERVICE_HOST = os.environ.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("SERVICE_PORT", "8000"))
+
+# Maksymalna liczba równoczesnych żądań jednego klienta
+MAX_REQUESTS_PER_CLIENT = int(os.environ.get("MAX_REQUESTS_PER_CLIENT", "4"))
+
+# Rozmiar współdzielonej puli połączeń do API OpenAI
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "200"))
+
+# Maksymalna liczba równoczesnych przebiegów wywołujących model (wszyscy klienci);
+# przebieg może otworzyć kilka połączeń naraz (np. trzy wersje robocze)
+MAX_CONCURRENT_RUNS = int(
+    os.environ.get("MAX_CONCURRENT_RUNS", str(max(OPENAI_MAX_CONNECTIONS // 4, 1)))
+)
+
+# Pamięć podręczna decyzji agenta wybierającego (plik opcjonalny)
+PICKER_CACHE_SIZE = int(os.environ.get("PICKER_CACHE_SIZE", "10000"))
+PICKER_CACHE_PATH = os.environ.get("PICKER_CACHE_PATH") or None
+
+DEFAULT_MESSAGE = "Write a cold sales email"
+
+
+# ============================================================================
+# LIMITY NA KLIENTA
+# ============================================================================
+
+
+class ClientLimiter:
+    """
+    Ogranicza liczbę równoczesnych żądań na klienta.
+
+    Żądanie ponad limit jest od razu odrzucane (HTTP 429), zamiast czekać
+    w kolejce - dzięki temu jeden klient nie zajmie całej puli połączeń.
+    Usługa działa w jednej pętli zdarzeń, więc liczniki nie wymagają blokad.
+    """
+
+    def __init__(self, max_per_client: int):
+        self.max_per_client = max_per_client
+        self._active: Dict[str, int] = {}
+
+    def try_acquire(self, client_id: str) -> bool:
+        """Rezerwuje miejsce dla klienta; zwraca False, gdy limit jest wyczerpany."""
+        active = self._active.get(client_id, 0)
+        if active >= self.max_per_client:
+            return False
+        self._active[client_id] = active + 1
+        return True
+
+    def release(self, client_id: str) -> None:
+        """Zwalnia miejsce klienta."""
+        active = self._active.get(client_id, 0) - 1
+        if active > 0:
+            self._active[client_id] = active
+        else:
+            self._active.pop(client_id, None)
+
+    def active(self, client_id: str) -> int:
+        """Zwraca liczbę trwających żądań klienta."""
+        return self._active.get(client_id, 0)
+
+
+def client_id(request: Request) -> str:
+    """
+    Identyfikuje klienta po adresie połączenia.
+
+    Nagłówki (np. X-Client-Id) są kontrolowane przez wywołującego - nowa
+    wartość w każdym żądaniu omijałaby limit. Za reverse proxy adres
+    klienta ustawia uvicorn (--proxy-headers z --forwarded-allow-ips).
+    """
+    return request.client.host if request.client else "unknown"
+
+
+def error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+async def read_message(request: Request) -> str:
+    """Odczytuje pole "message" z ciała JSON (pole opcjonalne)."""
+    try:
+        payload = await request.json() if await request.body() else {}
+    except json.JSONDecodeError:
+        raise ValueError("Ciało żądania musi być poprawnym JSON")
+    if not isinstance(payload, dict):
+        raise ValueError("Ciało żądania musi być obiektem JSON")
+    message = payload.get("message", DEFAULT_MESSAGE)
+    if not isinstance(message, str) or not message.strip():
+        raise ValueError("Pole 'message' musi być niepustym tekstem")
+    return message
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """
+    Odpowiedź strumieniowa, która po zakończeniu zawsze wywołuje `release`.
+
+    Zwolnienie następuje w tym samym zakresie co wysyłanie odpowiedzi,
+    więc działa także wtedy, gdy klient rozłączy się przed pierwszym
+    fragmentem (Starlette anuluje wtedy zadanie, a generator treści nie
+    zdąży nawet wystartować).
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], release: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+@function_tool(name_override="send_email")
+async def send_email_async(body: str) -> Dict[str, str]:
+    """
+    Wysyła e-mail z podaną treścią do wszystkich potencjalnych klientów.
+
+    Odpowiednik main.send_email dla usługi: synchroniczne narzędzie
+    blokowałoby wspólną pętlę zdarzeń (i wszystkie strumienie SSE)
+    na czas żądania HTTP do SendGrid, więc wysyłka odbywa się w wątku.
+
+    Args:
+        body: Treść wiadomości e-mail do wysłania
+    """
+    await asyncio.to_thread(deliver_email, TO_EMAIL, "Sales email", body)
+    return {"status": "success"}
+
+
+def sse_event(data: Dict, event: Optional[str] = None) -> bytes:
+    """Koduje jedno zdarzenie Server-Sent Events."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+# ============================================================================
+# ENDPOINTY
+# ============================================================================
+
+
+async def stream_email(request: Request) -> Response:
+    """Strumieniuje wersję roboczą e-maila wybranej persony jako SSE."""
+    state = request.app.state
+    try:
+        message = await read_message(request)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    persona = request.query_params.get("persona", "1")
+    if not persona.isdigit() or not 1 <= int(persona) <= len(state.sales_agents):
+        return error(f"Parametr 'persona' musi być z zakresu 1-{len(state.sales_agents)}", 400)
+    agent = state.sales_agents[int(persona) - 1]
+
+    cid = client_id(request)
+    if not state.limiter.try_acquire(cid):
+        return error("Przekroczono limit równoczesnych żądań klienta", 429)
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async with state.upstream:
+                async for delta in state.flight.stream(agent, message):
+                    yield sse_event({"delta": delta})
+            yield sse_event({}, event="done")
+        except Exception as e:
+            yield sse_event({"error": str(e)}, event="error")
+
+    return ReleasingStreamingResponse(
+        events(),
+        lambda: state.limiter.release(cid),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
+
+
+async def run_limited(request: Request, handler) -> Response:
+    """Wykonuje handler z limitem na klienta, wspólnym limitem przebiegów i obsługą błędów."""
+    try:
+        message = await read_message(request)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    cid = client_id(request)
+    state = request.app.state
+    limiter = state.limiter
+    if not limiter.try_acquire(cid):
+        return error("Przekroczono limit równoczesnych żądań klienta", 429)
+    try:
+        async with state.upstream:
+            return JSONResponse(await handler(state, message))
+    except Exception as e:
+        return error(str(e), 502)
+    finally:
+        limiter.release(cid)
+
+
+async def best_email(request: Request) -> Response:
+    """Generuje trzy warianty i zwraca najlepszy."""
+
+    async def handler(state, message: str) -> Dict[str, str]:
+        # Identyczne żądania w locie współdzielą jeden przebieg (4 wywołania modelu)
+        email = await state.flight.do(
+            ("best", message),
+            lambda: select_best_email(
+                *state.sales_agents, state.picker_agent, message, state.picker_cache
+            ),
+        )
+        return {"email": email}
+
+    return await run_limited(request, handler)
+
+
+async def manager_with_tools(request: Request) -> Response:
+    """Uruchamia agenta kierownika z narzędziami."""
+
+    async def handler(state, message: str) -> Dict[str, str]:
+        result = await Runner.run(state.tools_manager, message)
+        return {"final_output": str(result.final_output)}
+
+    return await run_limited(request, handler)
+
+
+async def manager_with_handoff(request: Request) -> Response:
+    """Uruchamia agenta kierownika z handoff do Email Managera (z kompaktowaniem kontekstu)."""
+
+    async def handler(state, message: str) -> Dict[str, str]:
+        result = await Runner.run(
+            state.handoff_manager, message, run_config=state.handoff_run_config
+        )
+        return {"final_output": str(result.final_output)}
+
+    return await run_limited(request, handler)
+
+
+async def health(request: Request) -> Response:
+    state = request.app.state
+    return JSONResponse(
+        {
+            "status": "ok",
+            "in_flight": state.flight.in_flight,
+            "calls": state.flight.calls,
+            "coalesced": state.flight.coalesced,
+            "picker_cache": state.picker_cache.stats(),
+        }
+    )
+
+
+# ============================================================================
+# APLIKACJA
+# ============================================================================
+
+
+def create_app(
+    openai_client: Optional[AsyncOpenAI] = None,
+    max_requests_per_client: int = MAX_REQUESTS_PER_CLIENT,
+    max_concurrent_runs: int = MAX_CONCURRENT_RUNS,
+) -> Starlette:
+    """
+    Tworzy aplikację ASGI ze współdzielonymi agentami i pulą połączeń.
+
+    Args:
+        openai_client: Klient OpenAI współdzielony przez wszystkie żądania
+            (domyślnie tworzony z pulą OPENAI_MAX_CONNECTIONS połączeń)
+        max_requests_per_client: Limit równoczesnych żądań jednego klienta
+        max_concurrent_runs: Limit równoczesnych przebiegów wszystkich klientów
+            (kolejne żądania czekają na zwolnienie miejsca)
+
+    Returns:
+        Aplikacja Starlette
+    """
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        client = openai_client or AsyncOpenAI(
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                )
+            )
+        )
+        set_default_openai_client(client)
+
+        state = app.state
+        state.limiter = ClientLimiter(max_requests_per_client)
+        state.upstream = asyncio.Semaphore(max_concurrent_runs)
+        state.flight = SingleFlight()
+        state.picker_cache = PickerCache(PICKER_CACHE_SIZE, PICKER_CACHE_PATH)
+        state.sales_agents = create_sales_agents()
+        state.picker_agent = create_picker_agent()
+
+        tools = create_sales_agent_tools(*state.sales_agents)
+        state.tools_manager = create_sales_manager_with_tools(tools + [send_email_async])
+        # Email Manager dostaje tylko zwycięską wersję, a starsze wersje są skracane
+        state.handoff_manager = create_sales_manager_with_handoff(
+            tools, winning_draft_handoff(create_parallel_email_manager_agent())
+        )
+        state.handoff_run_config = compacting_run_config()
+        try:
+            yield
+        finally:
+            await state.flight.close()
+            if state.picker_cache.path is not None:
+                state.picker_cache.save()
+            if openai_client is None:
+                await client.close()
+
+    routes = [
+        Route("/emails/stream", stream_email, methods=["POST"]),
+        Route("/emails/best", best_email, methods=["POST"]),
+        Route("/managers/tools", manager_with_tools, methods=["POST"]),
+        Route("/managers/handoff", manager_with_handoff, methods=["POST"]),
+        Route("/health", health, methods=["GET"]),
+    ]
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=SERVICE_HOST, port=SERVICE_PORT)
@@ -0,0 +1,130 @@
+"""
+Testy jednostkowe dla modułu campaign.py
+
+Testy sprawdzają:
+- Wyciąganie potrzebnych pól z RunResult
+- Zapis wyników do pliku JSONL
+- Uruchamianie kampanii z ograniczoną współbieżnością
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SENDGRID_API_KEY", "test_key")
+
+from campaign import JsonlResultSink, extract_record, run_campaign  # noqa: E402
+
+
+def fake_result(final_output: str) -> SimpleNamespace:
+    """Obiekt o kształcie RunResult"""
+    return SimpleNamespace(
+        final_output=final_output,
+        new_items=["dużo danych"] * 100,
+        last_agent=SimpleNamespace(name="Sales Manager"),
+        context_wrapper=SimpleNamespace(
+            usage=SimpleNamespace(requests=4, input_tokens=100, output_tokens=50)
+        ),
+    )
+
+
+class TestExtractRecord:
+    """Testy wyciągania rekordów z RunResult"""
+
+    def test_extract_record_keeps_only_needed_fields(self):
+        """Test, że rekord nie zawiera elementów rozmowy"""
+        record = extract_record("a@x.com", fake_result("Dear Ann"))
+
+        assert record == {
+            "prospect": "a@x.com",
+            "status": "ok",
+            "final_output": "Dear Ann",
+            "last_agent": "Sales Manager",
+            "requests": 4,
+            "input_tokens": 100,
+            "output_tokens": 50,
+        }
+
+
+class TestJsonlResultSink:
+    """Testy zapisu wyników do JSONL"""
+
+    def test_appends_records(self, tmp_path):
+        """Test dopisywania rekordów do istniejącego pliku"""
+        path = tmp_path / "results.jsonl"
+        with JsonlResultSink(path) as sink:
+            sink.write({"prospect": "a"})
+        with JsonlResultSink(path) as sink:
+            sink.write({"prospect": "b"})
+
+        lines = path.read_text().splitlines()
+        assert [json.loads(line)["prospect"] for line in lines] == ["a", "b"]
+
+    def test_record_on_disk_before_close(self, tmp_path):
+        """Test natychmiastowego zapisu rekordu (odporność na awarię w trakcie kampanii)"""
+        path = tmp_path / "results.jsonl"
+        with JsonlResultSink(path) as sink:
+            sink.write({"prospect": "a"})
+
+            assert json.loads(path.read_text())["prospect"] == "a"
+
+    def test_write_requires_open_sink(self, tmp_path):
+        """Test błędu przy zapisie bez otwarcia pliku"""
+        with pytest.raises(RuntimeError):
+            JsonlResultSink(tmp_path / "results.jsonl").write({})
+
+
+class TestRunCampaign:
+    """Testy uruchamiania kampanii"""
+
+    @pytest.mark.asyncio
+    async def test_run_campaign_streams_results(self, tmp_path):
+        """Test zapisu wyników i obsługi błędów przebiegu"""
+        active = 0
+        max_active = 0
+
+        async def pipeline(prospect):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            if prospect["email"] == "bad@x.com":
+                raise RuntimeError("API error")
+            return fake_result(f"Hi {prospect['email']}")
+
+        prospects = [{"email": f"p{i}@x.com"} for i in range(7)] + [{"email": "bad@x.com"}]
+        path = tmp_path / "results.jsonl"
+        with JsonlResultSink(path) as sink:
+            stats = await run_campaign(iter(prospects), pipeline, sink, max_concurrency=3)
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert stats == {"ok": 7, "error": 1}
+        assert len(records) == 8
+        assert max_active <= 3
+        assert {"prospect": "bad@x.com", "status": "error", "error": "API error"} in records
+
+    @pytest.mark.asyncio
+    async def test_write_error_counted_as_failure(self, tmp_path):
+        """Test zliczenia przebiegu, którego wyniku nie udało się zapisać"""
+
+        class FailingSink(JsonlResultSink):
+            def write(self, record):
+                if record["prospect"] == "bad@x.com":
+                    raise OSError("Brak miejsca na dysku")
+                super().write(record)
+
+        async def pipeline(prospect):
+            return fake_result("Hi")
+
+        prospects = [{"email": f"p{i}@x.com"} for i in range(5)] + [{"email": "bad@x.com"}]
+        with FailingSink(tmp_path / "results.jsonl") as sink:
+            stats = await run_campaign(iter(prospects), pipeline, sink, max_concurrency=2)
+
+        assert stats == {"ok": 5, "error": 1}
+        assert sink.written == 5
@@ -0,0 +1,204 @@
+"""
+Testy jednostkowe dla modułu coalescing.py
+
+Testy sprawdzają:
+- Klucz żądania zależny od konfiguracji agenta i wiadomości
+- Współdzielenie jednego przebiegu przez identyczne żądania w locie
+- Rozsyłanie strumienia delt do wielu subskrybentów
+- Propagację błędów i anulowania
+"""
+
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from agents import ModelSettings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SENDGRID_API_KEY", "test_key")
+
+from coalescing import SingleFlight, request_key  # noqa: E402
+from main import create_sales_agents  # noqa: E402
+
+
+class TestRequestKey:
+    """Testy klucza żądania"""
+
+    def test_same_request_same_key(self):
+        """Test identycznego klucza dla identycznego żądania"""
+        agent1, _, _ = create_sales_agents()
+        again, _, _ = create_sales_agents()
+
+        assert request_key(agent1, "Write") == request_key(again, "Write")
+
+    def test_different_agent_or_message(self):
+        """Test różnych kluczy dla różnych person i wiadomości"""
+        agent1, agent2, _ = create_sales_agents()
+
+        assert request_key(agent1, "Write") != request_key(agent2, "Write")
+        assert request_key(agent1, "Write") != request_key(agent1, "Send")
+
+    def test_agent_configuration_changes_key(self):
+        """Test różnych kluczy dla agentów o innych ustawieniach, narzędziach lub typie wyniku"""
+        agent1, agent2, _ = create_sales_agents()
+        key = request_key(agent1, "Write")
+        tuned = agent1.clone(model_settings=ModelSettings(temperature=0.1))
+
+        assert request_key(tuned, "Write") != key
+        assert request_key(agent1.clone(tools=[agent2.as_tool("tool", "Tool")]), "Write") != key
+        assert request_key(agent1.clone(handoffs=[agent2]), "Write") != key
+        assert request_key(agent1.clone(output_type=list[str]), "Write") != key
+
+
+class TestSingleFlight:
+    """Testy współdzielenia przebiegów"""
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_share_one_run(self):
+        """Test jednego wywołania modelu dla wielu identycznych żądań"""
+        calls = 0
+
+        async def fake_run(agent, message):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return f"email for {message}"
+
+        agent, _, _ = create_sales_agents()
+        flight = SingleFlight()
+        with patch("coalescing.run_final_output", new=fake_run):
+            results = await asyncio.gather(*(flight.run(agent, "Write") for _ in range(10)))
+
+        assert calls == 1
+        assert results == ["email for Write"] * 10
+        assert (flight.calls, flight.coalesced, flight.in_flight) == (10, 9, 0)
+
+    @pytest.mark.asyncio
+    async def test_sequential_requests_are_not_cached(self):
+        """Test, że zakończony przebieg nie jest zapamiętywany"""
+        flight = SingleFlight()
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            return "ok"
+
+        await flight.do("key", factory)
+        await flight.do("key", factory)
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_error_reaches_all_waiters(self):
+        """Test przekazania wyjątku wszystkim oczekującym"""
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("API error")
+
+        results = await asyncio.gather(
+            *(flight.do("key", failing) for _ in range(3)), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_shared_run(self):
+        """Test, że anulowanie jednego oczekującego nie przerywa przebiegu"""
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", slow))
+        second = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
+
+    @pytest.mark.asyncio
+    async def test_stream_fan_out(self):
+        """Test rozsyłania jednego strumienia do wielu subskrybentów"""
+        calls = 0
+
+        async def fake_stream(agent, message):
+            nonlocal calls
+            calls += 1
+            for delta in ["Dear ", "CEO, ", "hello"]:
+                await asyncio.sleep(0.01)
+                yield delta
+
+        async def collect(flight, agent, delay):
+            await asyncio.sleep(delay)
+            return "".join([delta async for delta in flight.stream(agent, "Write")])
+
+        agent, _, _ = create_sales_agents()
+        flight = SingleFlight()
+        with patch("coalescing.stream_email_deltas", new=fake_stream):
+            # Drugi subskrybent dołącza w trakcie strumienia
+            results = await asyncio.gather(collect(flight, agent, 0), collect(flight, agent, 0.015))
+
+        assert calls == 1
+        assert results == ["Dear CEO, hello"] * 2
+        assert flight.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_stream_cancelled_when_last_subscriber_leaves(self):
+        """Test przerwania przebiegu, gdy nikt już nie czyta strumienia"""
+        closed = asyncio.Event()
+
+        async def endless_stream(agent, message):
+            try:
+                while True:
+                    await asyncio.sleep(0.005)
+                    yield "delta "
+            finally:
+                closed.set()
+
+        async def read_two(flight, agent):
+            deltas = []
+            async for delta in flight.stream(agent, "Write"):
+                deltas.append(delta)
+                if len(deltas) == 2:
+                    break
+            return deltas
+
+        agent, _, _ = create_sales_agents()
+        flight = SingleFlight()
+        with patch("coalescing.stream_email_deltas", new=endless_stream):
+            reader = asyncio.ensure_future(read_two(flight, agent))
+            await asyncio.wait_for(reader, 1)
+            # Przerwana pętla async for zamyka generator przy kolejnym cyklu pętli zdarzeń
+            await asyncio.sleep(0.01)
+            await asyncio.wait_for(closed.wait(), 1)
+
+        assert flight.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_close_cancels_producer_without_leaking_cancellation(self):
+        """Test, że zamknięcie przerywa przebieg, a subskrybent dostaje zwykły błąd"""
+
+        async def endless_stream(agent, message):
+            while True:
+                await asyncio.sleep(0.005)
+                yield "delta "
+
+        async def read_all(flight, agent):
+            return [delta async for delta in flight.stream(agent, "Write")]
+
+        agent, _, _ = create_sales_agents()
+        flight = SingleFlight()
+        with patch("coalescing.stream_email_deltas", new=endless_stream):
+            reader = asyncio.ensure_future(read_all(flight, agent))
+            await asyncio.sleep(0.02)
+            await flight.close()
+
+            with pytest.raises(RuntimeError, match="anulowany"):
+                await reader
+
+        assert flight.in_flight == 0
@@ -0,0 +1,217 @@
+"""
+Testy jednostkowe dla modułu compaction.py
+
+Testy sprawdzają:
+- Oznaczanie wersji roboczych identyfikatorami i zastępowanie starszych odnośnikami
+- Pozostawienie najnowszej rundy i innych narzędzi bez zmian
+- Przekazanie Email Managerowi wyłącznie zwycięskiej wersji roboczej (po identyfikatorze)
+- Spadek liczby tokenów wejściowych w pełnym przebiegu na mocku OpenAI
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from agents import Agent, OpenAIResponsesModel, RunConfig, Runner, function_tool
+from agents.handoffs import HandoffInputData
+from openai import AsyncOpenAI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("SENDGRID_API_KEY", "test_key")
+
+from compaction import (  # noqa: E402
+    compact_tool_outputs,
+    compacting_run_config,
+    winning_draft_handoff,
+)
+from main import create_sales_manager_with_handoff  # noqa: E402
+from mock_servers import MockBehavior, create_openai_app  # noqa: E402
+
+DRAFT = "Dear CEO, " + "word " * 200
+
+
+def call(call_id: str, name: str) -> dict:
+    return {"type": "function_call", "call_id": call_id, "name": name, "arguments": "{}"}
+
+
+def output(call_id: str, text: str = DRAFT) -> dict:
+    return {"type": "function_call_output", "call_id": call_id, "output": text}
+
+
+def two_rounds() -> list[dict]:
+    """Historia kierownika: dwie rundy trzech narzędzi sales_agent."""
+    items = [{"role": "user", "content": "Send an email"}]
+    for round_number in (1, 2):
+        ids = [f"r{round_number}_{i}" for i in (1, 2, 3)]
+        items += [call(call_id, f"sales_agent{call_id[-1]}") for call_id in ids]
+        items += [output(call_id) for call_id in ids]
+    return items
+
+
+class TestCompactToolOutputs:
+    """Testy kompaktowania historii"""
+
+    def test_older_rounds_replaced_with_references(self):
+        """Test zastąpienia pierwszej rundy odnośnikami"""
+        items = two_rounds()
+
+        compacted = compact_tool_outputs(items, keep_last=3)
+
+        outputs = [
+            item["output"] for item in compacted if item.get("type") == "function_call_output"
+        ]
+        assert outputs[0].startswith("[Draft r1_1] Earlier draft from sales_agent1 omitted")
+        assert all("omitted" in text for text in outputs[:3])
+        assert outputs[3:] == [f"[Draft r2_{i}]\n{DRAFT}" for i in (1, 2, 3)]
+        assert len(json.dumps(compacted)) < len(json.dumps(items)) * 0.7
+
+    def test_input_not_mutated(self):
+        """Test niezmienności oryginalnych elementów"""
+        items = two_rounds()
+        snapshot = json.dumps(items)
+
+        compact_tool_outputs(items, keep_last=3)
+
+        assert json.dumps(items) == snapshot
+
+    def test_other_tools_untouched(self):
+        """Test pozostawienia wyników innych narzędzi"""
+        items = [call("a", "send_email"), output("a"), call("b", "sales_agent1"), output("b")]
+
+        assert compact_tool_outputs(items, keep_last=0)[1]["output"] == DRAFT
+        assert compact_tool_outputs(items, keep_last=0)[3]["output"].startswith("[Draft b]")
+
+
+class TestWinningDraftHandoff:
+    """Testy handoffu przekazującego tylko zwycięską wersję"""
+
+    @staticmethod
+    def data(draft_id: str, handoff_name: str) -> HandoffInputData:
+        """Historia dwóch rund; zwycięska wersja pochodzi z wcześniejszej rundy."""
+        history = [
+            output(item["call_id"], "Winner " + DRAFT) if item.get("call_id") == "r1_2" else item
+            for item in two_rounds()
+        ]
+        raw_call = SimpleNamespace(
+            type="function_call",
+            name=handoff_name,
+            arguments=json.dumps({"draft_id": draft_id}),
+        )
+        return HandoffInputData(
+            input_history=tuple(history),
+            pre_handoff_items=(),
+            new_items=(SimpleNamespace(raw_item=raw_call),),
+        )
+
+    def test_filter_copies_full_winning_draft(self):
+        """Test zastąpienia historii pełną treścią wskazanej wersji"""
+        handoff = winning_draft_handoff(Agent(name="Email Manager"))
+
+        filtered = handoff.input_filter(self.data("r1_2", handoff.tool_name))
+
+        assert filtered.input_history == ({"role": "user", "content": "Winner " + DRAFT},)
+        assert filtered.new_items == ()
+
+    def test_filter_accepts_label_as_id(self):
+        """Test rozpoznania identyfikatora podanego razem ze znacznikiem [Draft ...]"""
+        handoff = winning_draft_handoff(Agent(name="Email Manager"))
+
+        filtered = handoff.input_filter(self.data("[Draft r1_2]", handoff.tool_name))
+
+        assert filtered.input_history[0]["content"].startswith("Winner")
+
+    def test_filter_finds_draft_in_run_items(self):
+        """Test odnalezienia wersji wśród elementów bieżącego przebiegu"""
+        handoff = winning_draft_handoff(Agent(name="Email Manager"))
+        raw_call = SimpleNamespace(
+            type="function_call",
+            name=handoff.tool_name,
+            arguments=json.dumps({"draft_id": "c1"}),
+        )
+        data = HandoffInputData(
+            input_history="Send an email",
+            pre_handoff_items=(SimpleNamespace(raw_item=output("c1", "Winner")),),
+            new_items=(SimpleNamespace(raw_item=raw_call),),
+        )
+
+        assert handoff.input_filter(data).input_history[0]["content"] == "Winner"
+
+    def test_filter_with_unknown_id_keeps_history(self):
+        """Test pozostawienia pełnej historii, gdy identyfikator nie pasuje do żadnej wersji"""
+        handoff = winning_draft_handoff(Agent(name="Email Manager"))
+        data = self.data("call_missing", handoff.tool_name)
+
+        assert handoff.input_filter(data) is data
+
+    def test_handoff_argument_is_reference(self):
+        """Test, że argument handoffu to identyfikator, a nie treść e-maila"""
+        handoff = winning_draft_handoff(Agent(name="Email Manager"))
+
+        assert list(handoff.input_json_schema["properties"]) == ["draft_id"]
+
+
+class TestEndToEnd:
+    """Testy pełnego przebiegu kierownika na mocku OpenAI"""
+
+    @staticmethod
+    def build(compact: bool) -> tuple[Agent, RunConfig]:
+        @function_tool
+        def sales_agent1(input: str) -> str:
+            """Pisze wersję roboczą e-maila."""
+            return DRAFT
+
+        @function_tool
+        def sales_agent2(input: str) -> str:
+            """Pisze wersję roboczą e-maila."""
+            return DRAFT
+
+        @function_tool
+        def sales_agent3(input: str) -> str:
+            """Pisze wersję roboczą e-maila."""
+            return DRAFT
+
+        @function_tool
+        def format_and_send_email(body: str) -> str:
+            """Udaje wysyłkę e-maila."""
+            return "sent"
+
+        behavior = MockBehavior(median_latency_ms=0, sales_rounds=3)
+        client = AsyncOpenAI(
+            base_url="http://mock/v1",
+            api_key="mock",
+            http_client=httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=create_openai_app(behavior))
+            ),
+        )
+        model = OpenAIResponsesModel(model="gpt-4o-mini", openai_client=client)
+        email_manager = Agent(name="Email Manager", tools=[format_and_send_email])
+        target = winning_draft_handoff(email_manager) if compact else email_manager
+        manager = create_sales_manager_with_handoff(
+            [sales_agent1, sales_agent2, sales_agent3], target
+        )
+        run_config = (
+            compacting_run_config(model=model, tracing_disabled=True)
+            if compact
+            else RunConfig(model=model, tracing_disabled=True)
+        )
+        return manager, run_config
+
+    @pytest.mark.asyncio
+    async def test_compaction_reduces_input_tokens(self):
+        """Test spadku tokenów wejściowych przy tym samym przebiegu"""
+        usage = {}
+        for compact in (False, True):
+            manager, run_config = self.build(compact)
+            result = await Runner.run(manager, "Send an email", run_config=run_config)
+            usage[compact] = [response.usage.input_tokens for response in result.raw_responses]
+
+        # Te same tury: 3 rundy narzędzi, handoff, wywołanie wysyłki, odpowiedź końcowa
+        assert len(usage[True]) == len(usage[False]) == 6
+        assert sum(usage[True]) < sum(usage[False]) / 2
+        # Pierwsza tura Email Managera widzi tylko zwycięską wersję
+        assert usage[True][4] < len(DRAFT)
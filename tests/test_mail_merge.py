@@ -0,0 +1,210 @@
+"""
+Testy jednostkowe dla modułu mail_merge.py
+
+Testy sprawdzają:
+- Wczytywanie odbiorców z plików CSV i JSONL
+- Wypełnianie pól zastępczych szablonu
+- Generowanie jednego szablonu na segment (mock agentów)
+"""
+
+import json
+import os
+import sys
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SENDGRID_API_KEY", "test_key")
+
+from mail_merge import (  # noqa: E402
+    load_prospects,
+    merge_fields,
+    render_template,
+    run_mail_merge,
+    split_subject,
+    validate_template,
+)
+
+
+class TestLoadProspects:
+    """Testy wczytywania listy odbiorców"""
+
+    def test_load_csv(self, tmp_path):
+        """Test wczytywania odbiorców z pliku CSV"""
+        path = tmp_path / "prospects.csv"
+        path.write_text("email,first_name,segment\na@x.com,Ann,CEO\nb@x.com,Bob,CTO\n")
+
+        prospects = list(load_prospects(path))
+
+        assert len(prospects) == 2
+        assert prospects[0] == {"email": "a@x.com", "first_name": "Ann", "segment": "CEO"}
+
+    def test_load_jsonl(self, tmp_path):
+        """Test wczytywania odbiorców z pliku JSONL"""
+        path = tmp_path / "prospects.jsonl"
+        path.write_text(json.dumps({"email": "a@x.com", "company": "Acme"}) + "\n\n")
+
+        assert list(load_prospects(path)) == [{"email": "a@x.com", "company": "Acme"}]
+
+    def test_unsupported_format(self, tmp_path):
+        """Test odrzucenia nieobsługiwanego formatu pliku"""
+        path = tmp_path / "prospects.txt"
+        path.write_text("a@x.com\n")
+
+        with pytest.raises(ValueError, match="format"):
+            list(load_prospects(path))
+
+    def test_missing_email(self, tmp_path):
+        """Test odrzucenia odbiorcy bez adresu e-mail"""
+        path = tmp_path / "prospects.csv"
+        path.write_text("email,first_name\n,Ann\n")
+
+        with pytest.raises(ValueError, match="email"):
+            list(load_prospects(path))
+
+
+class TestTemplates:
+    """Testy szablonów i pól zastępczych"""
+
+    def test_merge_fields_excludes_email_and_segment(self):
+        """Test pomijania pól technicznych"""
+        prospect = {"email": "a@x.com", "segment": "CEO", "company": "Acme", "first_name": "Ann"}
+        assert merge_fields(prospect) == ["company", "first_name"]
+
+    def test_render_template(self):
+        """Test wypełniania pól zastępczych"""
+        template = "Dear {{first_name}}, {{ company }} deserves SOC2."
+        result = render_template(template, {"first_name": "Ann", "company": "Acme"})
+        assert result == "Dear Ann, Acme deserves SOC2."
+
+    def test_render_template_missing_field(self):
+        """Test błędu przy brakującej wartości pola"""
+        with pytest.raises(ValueError, match="company"):
+            render_template("Hi {{company}}", {"email": "a@x.com"})
+
+    @pytest.mark.parametrize(
+        "template",
+        [
+            "Hi {{company}}",
+            "Hi {{First Name}}",
+            "Hi {{first-name}}",
+            "Hi {{first_name}}, regards, [Your Name]",
+        ],
+    )
+    def test_validate_template_rejects_unknown_placeholders(self, template):
+        """Test odrzucenia pól spoza listy, w złej postaci i wymyślonych przez model"""
+        with pytest.raises(ValueError):
+            validate_template(template, ["first_name"])
+
+    def test_validate_template_accepts_known_fields_and_links(self):
+        """Test akceptacji dozwolonych pól i linków Markdown"""
+        validate_template("Hi {{ first_name }}, see [Book a demo](https://x.com)", ["first_name"])
+
+    def test_split_subject(self):
+        """Test oddzielania tematu od treści"""
+        assert split_subject("Subject: Hello\n\nBody") == ("Hello", "Body")
+        assert split_subject("Body only") == ("Sales email", "Body only")
+
+
+class TestRunMailMerge:
+    """Testy korespondencji seryjnej"""
+
+    @pytest.mark.asyncio
+    async def test_one_template_per_segment(self, tmp_path):
+        """Test, że liczba generowanych szablonów równa się liczbie segmentów"""
+        path = tmp_path / "prospects.csv"
+        path.write_text(
+            "email,first_name,segment\n"
+            "a@x.com,Ann,CEO\nb@x.com,Bob,CEO\nc@x.com,Cid,CTO\nd@x.com,,CTO\n"
+        )
+        sent = []
+
+        with patch(
+            "mail_merge.select_best_email",
+            new=AsyncMock(return_value="Subject: Hi {{first_name}}\n\nDear {{first_name}}"),
+        ) as mock_select:
+            stats = await run_mail_merge(
+                path,
+                "Write a cold sales email",
+                (object(), object(), object()),
+                object(),
+                sender=lambda to, subject, body: sent.append((to, subject, body)),
+            )
+
+        assert mock_select.await_count == 2
+        assert stats == {"segments": 2, "sent": 3, "skipped": 1, "failed": 0}
+        assert ("a@x.com", "Hi Ann", "Dear Ann") in sent
+
+    @pytest.mark.asyncio
+    async def test_failed_send_counted_regardless_of_timing(self, tmp_path):
+        """Test zliczania nieudanej wysyłki także przy ograniczaniu liczby zadań"""
+        path = tmp_path / "prospects.csv"
+        path.write_text(
+            "email,first_name\n" + "".join(f"p{i}@x.com,P{i}\n" for i in range(30))
+        )
+
+        def sender(to, subject, body):
+            if to in ("p0@x.com", "p29@x.com"):
+                raise RuntimeError("SendGrid 500")
+
+        template = AsyncMock(return_value="Hi {{first_name}}")
+        with patch("mail_merge.select_best_email", new=template):
+            stats = await run_mail_merge(
+                path,
+                "Write a cold sales email",
+                (object(), object(), object()),
+                object(),
+                sender=sender,
+                max_concurrent_sends=1,
+            )
+
+        assert stats == {"segments": 1, "sent": 28, "skipped": 0, "failed": 2}
+
+    @pytest.mark.asyncio
+    async def test_failed_template_fails_its_segment_only(self, tmp_path):
+        """Test nieudanego generowania szablonu jednego segmentu"""
+        path = tmp_path / "prospects.csv"
+        path.write_text("email,segment\na@x.com,CEO\nb@x.com,CTO\nc@x.com,CTO\n")
+
+        async def select(agent1, agent2, agent3, picker, prompt):
+            if select.calls == 0:
+                select.calls += 1
+                return "Hello"
+            raise RuntimeError("OpenAI 500")
+
+        select.calls = 0
+        sent = []
+        with patch("mail_merge.select_best_email", new=select):
+            stats = await run_mail_merge(
+                path,
+                "Write a cold sales email",
+                (object(), object(), object()),
+                object(),
+                sender=lambda to, subject, body: sent.append(to),
+            )
+
+        assert stats == {"segments": 2, "sent": 1, "skipped": 0, "failed": 2}
+        assert sent == ["a@x.com"]
+
+    @pytest.mark.asyncio
+    async def test_invalid_template_fails_segment(self, tmp_path):
+        """Test, że szablon z niepoprawnym polem nie trafia do odbiorców"""
+        path = tmp_path / "prospects.csv"
+        path.write_text("email,first_name\na@x.com,Ann\nb@x.com,Bob\n")
+        sent = []
+
+        with patch(
+            "mail_merge.select_best_email",
+            new=AsyncMock(return_value="Dear {{First Name}}, regards [Your Name]"),
+        ):
+            stats = await run_mail_merge(
+                path,
+                "Write a cold sales email",
+                (object(), object(), object()),
+                object(),
+                sender=lambda to, subject, body: sent.append(to),
+            )
+
+        assert stats == {"segments": 1, "sent": 0, "skipped": 0, "failed": 2}
+        assert sent == []
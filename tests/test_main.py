@@ -8,10 +8,11 @@ Testy sprawdzają:
 - Integrację z SendGrid (mock)
 """
 
+import asyncio
 import os
 import sys
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from typing import Dict
 
 # Dodanie ścieżki do modułu głównego
@@ -25,7 +26,9 @@ with patch.dict('sys.modules', {'sendgrid': MagicMock()}):
         create_sales_agent_tools,
         create_sales_manager_with_tools,
         create_email_manager_agent,
+        create_parallel_email_manager_agent,
         create_sales_manager_with_handoff,
+        format_email,
         send_email,
         send_html_email,
     )
@@ -156,6 +159,33 @@ class TestManagers:
         assert email_manager.handoff_description is not None
         assert len(email_manager.tools) == 3  # subject_tool, html_tool, send_html_email
 
+    def test_create_parallel_email_manager_agent(self):
+        """Test tworzenia agenta zarządzającego z równoległym formatowaniem"""
+        email_manager = create_parallel_email_manager_agent()
+
+        assert email_manager.name == "Email Manager"
+        assert email_manager.handoff_description is not None
+        assert len(email_manager.tools) == 1  # format_and_send_email
+        assert email_manager.tools[0].name == "format_and_send_email"
+
+    @pytest.mark.asyncio
+    async def test_format_email_runs_in_parallel(self):
+        """Test równoległego generowania tematu i HTML"""
+        started = []
+
+        async def fake_run(agent, message):
+            started.append(agent)
+            await asyncio.sleep(0.05)
+            # Oba wywołania muszą wystartować przed zakończeniem pierwszego
+            assert len(started) == 2
+            return MagicMock(final_output=f"{agent}:{message}")
+
+        with patch('main.Runner.run', new=AsyncMock(side_effect=fake_run)):
+            subject, html = await format_email("Body", "subject", "html")
+
+        assert subject == "subject:Body"
+        assert html == "html:Body"
+
     def test_create_sales_manager_with_handoff(self):
         """Test tworzenia agenta kierownika z handoff"""
         agent1, agent2, agent3 = create_sales_agents()
@@ -0,0 +1,178 @@
+"""
+Testy jednostkowe dla benchmarks/mock_servers.py
+
+Testy sprawdzają:
+- Scenariusz wywołań narzędzi odtwarzający przepływy z main.py
+- Wstrzykiwanie błędów 429 i 500
+- Zgodność odpowiedzi (także SSE) z OpenAI Agents SDK
+"""
+
+import json
+import os
+import socket
+import sys
+
+import httpx
+import pytest
+from agents import OpenAIResponsesModel, Runner
+from openai import AsyncOpenAI
+from starlette.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("SENDGRID_API_KEY", "test_key")
+
+from main import create_sales_agents  # noqa: E402
+from mock_servers import (  # noqa: E402
+    BackgroundServer,
+    MockBehavior,
+    ServerStats,
+    create_openai_app,
+    create_sendgrid_app,
+    plan_output,
+)
+
+
+def tool(name: str) -> dict:
+    return {"type": "function", "name": name, "parameters": {"properties": {"input": {}}}}
+
+
+def mock_model(behavior: MockBehavior) -> OpenAIResponsesModel:
+    """Model SDK kierujący żądania bezpośrednio do aplikacji ASGI mocka."""
+    transport = httpx.ASGITransport(app=create_openai_app(behavior))
+    client = AsyncOpenAI(
+        base_url="http://mock/v1",
+        api_key="mock",
+        http_client=httpx.AsyncClient(transport=transport),
+        max_retries=0,
+    )
+    return OpenAIResponsesModel(model="gpt-4o-mini", openai_client=client)
+
+
+class TestPlanOutput:
+    """Testy scenariusza odpowiedzi modelu"""
+
+    def test_calls_all_sales_tools_first(self):
+        """Test wywołania wszystkich narzędzi sales_agent na początku"""
+        tools = [tool("sales_agent1"), tool("sales_agent2"), tool("send_email")]
+        payload = {"input": "Send", "tools": tools}
+
+        output = plan_output(payload, "text")
+
+        assert [item["name"] for item in output] == ["sales_agent1", "sales_agent2"]
+
+    def test_calls_send_after_drafts(self):
+        """Test wywołania narzędzia wysyłki po wygenerowaniu wersji roboczych"""
+        history = [{"type": "function_call", "name": "sales_agent1"}]
+        payload = {"input": history, "tools": [tool("sales_agent1"), tool("send_email")]}
+
+        output = plan_output(payload, "text")
+
+        assert [item["name"] for item in output] == ["send_email"]
+
+    def test_repeats_sales_tools_for_rounds(self):
+        """Test kolejnej rundy narzędzi sales_agent i krótkiego polecenia w argumentach"""
+        history = [{"type": "function_call", "name": "sales_agent1"}]
+        payload = {"input": history, "tools": [tool("sales_agent1"), tool("send_email")]}
+
+        output = plan_output(payload, "text", sales_rounds=2)
+
+        assert [item["name"] for item in output] == ["sales_agent1"]
+        assert "text" not in output[0]["arguments"]
+
+    def test_handoff_references_last_draft(self):
+        """Test handoffu z identyfikatorem ostatniej wersji roboczej zamiast jej treści"""
+        history = [
+            {"type": "function_call", "name": "sales_agent1", "call_id": "call_1"},
+            {"type": "function_call", "name": "sales_agent1", "call_id": "call_2"},
+        ]
+        handoff_tool = {
+            "type": "function",
+            "name": "transfer_to_email_manager",
+            "parameters": {"properties": {"draft_id": {}}},
+        }
+        payload = {"input": history, "tools": [tool("sales_agent1"), handoff_tool]}
+
+        output = plan_output(payload, "text", sales_rounds=2)
+
+        assert json.loads(output[0]["arguments"]) == {"draft_id": "call_2"}
+
+    def test_returns_message_without_tools(self):
+        """Test zwykłej odpowiedzi tekstowej"""
+        output = plan_output({"input": "Write"}, "Dear CEO")
+
+        assert output[0]["type"] == "message"
+        assert output[0]["content"][0]["text"] == "Dear CEO"
+
+
+class TestFailureInjection:
+    """Testy wstrzykiwania błędów"""
+
+    def test_rate_limit(self):
+        """Test odpowiedzi 429 z nagłówkiem Retry-After"""
+        stats = ServerStats()
+        app = create_openai_app(MockBehavior(median_latency_ms=0, rate_limit_rate=1.0), stats)
+
+        response = TestClient(app).post("/v1/responses", json={"input": "hi"})
+
+        assert response.status_code == 429
+        assert "retry-after" in response.headers
+        assert stats.by_status == {429: 1}
+
+    def test_sendgrid_accepts_mail(self):
+        """Test odpowiedzi 202 mocka SendGrid"""
+        app = create_sendgrid_app(MockBehavior(median_latency_ms=0))
+
+        response = TestClient(app).post("/v3/mail/send", json={})
+
+        assert response.status_code == 202
+
+
+class TestSdkCompatibility:
+    """Testy zgodności z OpenAI Agents SDK"""
+
+    @pytest.mark.asyncio
+    async def test_runner_run(self):
+        """Test zwykłego przebiegu agenta na mocku"""
+        agent, _, _ = create_sales_agents()
+        agent = agent.clone(model=mock_model(MockBehavior(median_latency_ms=0)))
+
+        result = await Runner.run(agent, "Write a cold sales email")
+
+        assert result.final_output.startswith("Dear CEO")
+
+    @pytest.mark.asyncio
+    async def test_runner_run_streamed(self):
+        """Test strumieniowania delt przez SSE"""
+        behavior = MockBehavior(median_latency_ms=0, delta_interval_ms=0, words_per_email=5)
+        agent, _, _ = create_sales_agents()
+        agent = agent.clone(model=mock_model(behavior))
+
+        result = Runner.run_streamed(agent, "Write a cold sales email")
+        deltas = [
+            event.data.delta
+            async for event in result.stream_events()
+            if event.type == "raw_response_event" and event.data.type == "response.output_text.delta"
+        ]
+
+        assert len(deltas) > 1
+        assert "".join(deltas).strip() == result.final_output
+
+
+class TestBackgroundServer:
+    """Testy uruchamiania serwera w tle"""
+
+    # uvicorn kończy wątek przez SystemExit, co pytest zgłasza jako ostrzeżenie
+    @pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+    def test_port_in_use_raises(self):
+        """Test błędu zamiast zawieszenia, gdy port jest zajęty"""
+        with socket.socket() as taken:
+            taken.bind(("127.0.0.1", 0))
+            taken.listen()
+            port = taken.getsockname()[1]
+            app = create_sendgrid_app(MockBehavior(median_latency_ms=0))
+
+            with pytest.raises(RuntimeError, match="nie wystartował"):
+                with BackgroundServer(app, port, startup_timeout=5):
+                    pass
@@ -0,0 +1,279 @@
+"""
+Testy jednostkowe dla modułu personas.py
+
+Testy sprawdzają:
+- Wczytywanie person z pliku JSON i walidację konfiguracji
+- Zgodność dołączonego personas.json z personami z main.py
+- Uczenie bandyty i zmniejszanie liczby wybieranych person
+- Zapis statystyk i wyników wysyłek
+- Wybór e-maila przez flotę (z pickerem i bez niego)
+- Demonstrację floty odporną na błędy wysyłki
+"""
+
+import json
+import os
+import sys
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SENDGRID_API_KEY", "test_key")
+
+from main import create_picker_agent  # noqa: E402
+from personas import (  # noqa: E402
+    DEFAULT_PERSONAS,
+    FleetSelection,
+    PersonaBandit,
+    apply_reply_outcomes,
+    create_persona_agents,
+    demo_persona_fleet,
+    identify_winner,
+    load_personas,
+    select_best_email_from_fleet,
+)
+
+PERSONAS = ["A", "B", "C", "D"]
+
+
+class TestLoadPersonas:
+    """Testy konfiguracji person"""
+
+    def test_bundled_config_matches_main(self):
+        """Test zgodności personas.json z personami z main.py"""
+        assert load_personas(os.path.join(ROOT, "personas.json")) == DEFAULT_PERSONAS
+
+    def test_missing_file_uses_defaults(self, tmp_path):
+        """Test person domyślnych przy braku pliku"""
+        assert load_personas(tmp_path / "missing.json") == DEFAULT_PERSONAS
+
+    def test_any_number_of_personas(self, tmp_path):
+        """Test dowolnej liczby person i domyślnego modelu"""
+        path = tmp_path / "personas.json"
+        path.write_text(
+            json.dumps([{"name": name, "instructions": f"Persona {name}"} for name in PERSONAS])
+        )
+
+        agents = create_persona_agents(load_personas(path))
+
+        assert list(agents) == PERSONAS
+        assert agents["D"].model == "gpt-4o-mini"
+
+    @pytest.mark.parametrize(
+        "entries",
+        [[], [{"name": "A"}], [{"name": "A", "instructions": "x"}] * 2],
+    )
+    def test_invalid_config(self, tmp_path, entries):
+        """Test błędów konfiguracji: pusta lista, brak pól, powtórzone nazwy"""
+        path = tmp_path / "personas.json"
+        path.write_text(json.dumps(entries))
+
+        with pytest.raises(ValueError):
+            load_personas(path)
+
+
+class TestPersonaBandit:
+    """Testy bandyty wybierającego persony"""
+
+    def test_uncertain_bandit_selects_many(self):
+        """Test wyboru wielu person bez danych"""
+        bandit = PersonaBandit(PERSONAS, seed=1)
+
+        assert len(bandit.select("CEO", max_k=3)) == 3
+
+    def test_learns_to_select_single_persona(self):
+        """Test ograniczenia do jednej persony po wielu zwycięstwach"""
+        bandit = PersonaBandit(PERSONAS, explore_rate=0.0, seed=1)
+        for _ in range(30):
+            bandit.record_pick("CEO", PERSONAS, "B")
+
+        assert bandit.select("CEO", max_k=3) == ["B"]
+        # Inny segment uczy się niezależnie
+        assert len(bandit.select("CTO", max_k=3)) == 3
+
+    def test_keeps_comparing_before_min_picks(self):
+        """Test porównywania max_k person przed min_picks decyzjami pickera"""
+        bandit = PersonaBandit(PERSONAS, min_picks=5, explore_rate=0.0, seed=1)
+        for _ in range(4):
+            bandit.record_pick("CEO", PERSONAS, "B")
+        # Odpowiedzi klientów nie są decyzjami pickera
+        for _ in range(20):
+            bandit.record_reply("CEO", "B", replied=True)
+
+        assert len(bandit.select("CEO", max_k=3)) == 3
+
+        bandit.record_pick("CEO", PERSONAS, "B")
+
+        assert bandit.select("CEO", max_k=3) == ["B"]
+
+    def test_single_candidate_pick_ignored(self):
+        """Test pominięcia decyzji bez konkurencji"""
+        bandit = PersonaBandit(PERSONAS)
+        bandit.record_pick("CEO", ["A"], "A")
+
+        assert bandit.stats("CEO")["A"] == {"alpha": 1.0, "beta": 1.0, "mean": 0.5}
+
+    def test_reply_outcomes(self, tmp_path):
+        """Test uczenia na odpowiedziach klientów z pliku"""
+        path = tmp_path / "replies.jsonl"
+        path.write_text(
+            '{"email": "a@x.com", "segment": "CEO", "persona": "A", "replied": "true"}\n'
+            '{"email": "b@x.com", "segment": "CEO", "persona": "B", "replied": "false"}\n'
+        )
+        bandit = PersonaBandit(PERSONAS, reply_weight=3.0, no_reply_weight=0.5)
+
+        assert apply_reply_outcomes(bandit, path) == 2
+        assert bandit.stats("CEO")["A"]["alpha"] == 4.0
+        assert bandit.stats("CEO")["B"]["beta"] == 1.5
+
+    def test_reply_outcomes_applied_once(self, tmp_path):
+        """Test jednokrotnego uwzględnienia wyników przy wielokrotnym wczytaniu dziennika"""
+        log = tmp_path / "persona_sends.jsonl"
+        stats_path = tmp_path / "persona_stats.json"
+        log.write_text(
+            '{"send_id": "s1", "email": "a@x.com", "segment": "CEO", "persona": "A", '
+            '"replied": "true"}\n'
+            '{"send_id": "s2", "email": "b@x.com", "segment": "CEO", "persona": "B"}\n'
+        )
+        bandit = PersonaBandit(PERSONAS, path=stats_path, reply_weight=3.0)
+        assert apply_reply_outcomes(bandit, log) == 1
+        bandit.save()
+
+        # Kolejne uruchomienie: ten sam dziennik, uzupełniony o wynik drugiej wysyłki
+        with log.open("a") as handle:
+            handle.write(
+                '{"send_id": "s2", "email": "b@x.com", "segment": "CEO", "persona": "B", '
+                '"replied": "yes"}\n'
+            )
+        restored = PersonaBandit(PERSONAS, path=stats_path, reply_weight=3.0)
+
+        assert apply_reply_outcomes(restored, log) == 1
+        assert apply_reply_outcomes(restored, log) == 0
+        assert restored.stats("CEO")["A"]["alpha"] == 4.0
+        assert restored.stats("CEO")["B"]["alpha"] == 4.0
+
+    def test_resend_to_same_prospect_counted(self, tmp_path):
+        """Test uwzględnienia wyniku ponownej wysyłki do tego samego klienta i persony"""
+        log = tmp_path / "persona_sends.jsonl"
+        log.write_text(
+            '{"send_id": "s1", "email": "a@x.com", "segment": "CEO", "persona": "A", '
+            '"replied": "false"}\n'
+            '{"send_id": "s2", "email": "a@x.com", "segment": "CEO", "persona": "A", '
+            '"replied": "true"}\n'
+        )
+        bandit = PersonaBandit(PERSONAS, reply_weight=3.0, no_reply_weight=0.5)
+
+        assert apply_reply_outcomes(bandit, log) == 2
+        assert bandit.stats("CEO")["A"] == {"alpha": 4.0, "beta": 1.5, "mean": 0.7273}
+
+    def test_applied_replies_bounded(self):
+        """Test ograniczenia liczby zapamiętanych identyfikatorów wysyłek"""
+        bandit = PersonaBandit(PERSONAS, max_applied_replies=2)
+        for send_id in ("s1", "s2", "s3"):
+            bandit.record_reply("CEO", "A", replied=False, send_id=send_id)
+
+        assert list(bandit._applied_replies) == ["s2", "s3"]
+        assert not bandit.record_reply("CEO", "A", replied=False, send_id="s3")
+
+    def test_persistence(self, tmp_path):
+        """Test zapisu i ponownego wczytania statystyk"""
+        path = tmp_path / "persona_stats.json"
+        bandit = PersonaBandit(PERSONAS, path=path)
+        bandit.record_pick("CEO", ["A", "B"], "A")
+        bandit.save()
+
+        restored = PersonaBandit(PERSONAS, path=path)
+
+        assert restored.stats("CEO")["A"]["alpha"] == 2.0
+        assert restored.stats("CEO")["B"]["beta"] == 2.0
+        assert restored._picks == {"CEO": 1}
+
+    def test_invalid_arguments(self):
+        """Test błędów konfiguracji bandyty"""
+        with pytest.raises(ValueError):
+            PersonaBandit([])
+        with pytest.raises(ValueError):
+            PersonaBandit(PERSONAS, confidence=1.0)
+
+
+class TestFleetSelection:
+    """Testy wyboru e-maila przez flotę person"""
+
+    def test_identify_winner_tolerates_edits(self):
+        """Test rozpoznania persony mimo drobnych zmian pickera"""
+        drafts = {"A": "Dear CEO, we help with SOC2.", "B": "Hi! Audits are fun with us."}
+
+        assert identify_winner("Hi!  Audits are fun with us.\n", drafts) == "B"
+        assert identify_winner("Hi! Audits are fun with us!!", drafts) == "B"
+
+    @pytest.mark.asyncio
+    async def test_picker_decision_updates_bandit(self):
+        """Test wywołania pickera i zapisu zwycięstwa dla kilku kandydatów"""
+        agents = create_persona_agents(DEFAULT_PERSONAS)
+        bandit = PersonaBandit(list(agents), seed=1)
+
+        async def fake_run(agent, message):
+            return f"Email from {agent.name}"
+
+        with patch("personas.run_final_output", new=fake_run), patch(
+            "main.run_final_output", new=AsyncMock(return_value="Email from Busy Sales Agent")
+        ):
+            selection = await select_best_email_from_fleet(
+                agents, create_picker_agent(), "Write", bandit, "CEO"
+            )
+
+        assert len(selection.candidates) == 3
+        assert selection.model_calls == 4
+        assert selection.persona == "Busy Sales Agent"
+        assert bandit.stats("CEO")["Busy Sales Agent"]["alpha"] == 2.0
+
+    @pytest.mark.asyncio
+    async def test_confident_bandit_skips_picker(self):
+        """Test jednego wywołania modelu, gdy bandyta jest pewny wyboru"""
+        agents = create_persona_agents(DEFAULT_PERSONAS)
+        bandit = PersonaBandit(list(agents), explore_rate=0.0, seed=1)
+        for _ in range(30):
+            bandit.record_pick("CEO", list(agents), "Engaging Sales Agent")
+
+        picker_run = AsyncMock()
+        with patch("personas.run_final_output", new=AsyncMock(return_value="Email")), patch(
+            "main.run_final_output", new=picker_run
+        ):
+            selection = await select_best_email_from_fleet(
+                agents, create_picker_agent(), "Write", bandit, "CEO"
+            )
+
+        assert selection.persona == "Engaging Sales Agent"
+        assert selection.model_calls == 1
+        picker_run.assert_not_awaited()
+
+
+class TestDemoPersonaFleet:
+    """Testy demonstracji floty person"""
+
+    @pytest.mark.asyncio
+    async def test_failed_send_does_not_lose_stats(self, tmp_path, monkeypatch):
+        """Test kontynuacji po błędzie wysyłki, zapisu statystyk i send_id w dzienniku"""
+        prospects = tmp_path / "prospects.csv"
+        prospects.write_text(
+            "email,first_name\n" + "".join(f"p{i}@x.com,P{i}\n" for i in range(6))
+        )
+        sends = tmp_path / "persona_sends.jsonl"
+        stats_path = tmp_path / "persona_stats.json"
+        monkeypatch.setattr("personas.PERSONA_STATS_PATH", str(stats_path))
+
+        def deliver(to_address, subject, body):
+            if to_address == "p0@x.com":
+                raise RuntimeError("SendGrid 500")
+
+        selection = FleetSelection("Subject: Hi\n\nBody", "Busy Sales Agent", ["Busy Sales Agent"])
+        with patch(
+            "personas.select_best_email_from_fleet", new=AsyncMock(return_value=selection)
+        ), patch("personas.deliver_email", new=deliver):
+            await demo_persona_fleet(str(prospects), sends_path=str(sends), max_concurrency=2)
+
+        records = [json.loads(line) for line in sends.read_text().splitlines()]
+        assert sorted(record["email"] for record in records) == [f"p{i}@x.com" for i in range(1, 6)]
+        assert len({record["send_id"] for record in records}) == 5
+        assert stats_path.exists()
@@ -0,0 +1,109 @@
+"""
+Testy jednostkowe dla modułu picker_cache.py
+
+Testy sprawdzają:
+- Klucz niezależny od kolejności i białych znaków wariantów
+- Zależność klucza od instrukcji i modelu agenta wybierającego
+- Usuwanie wpisów (LRU), statystyki trafień i zapis na dysk
+- Pomijanie wywołania agenta wybierającego w pick_best_email
+"""
+
+import os
+import sys
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SENDGRID_API_KEY", "test_key")
+
+from main import create_picker_agent, pick_best_email  # noqa: E402
+from picker_cache import PickerCache, candidate_set_key  # noqa: E402
+
+
+class TestCandidateSetKey:
+    """Testy klucza zbioru wariantów"""
+
+    def test_order_and_whitespace_independent(self):
+        """Test niezależności od kolejności i białych znaków"""
+        picker = create_picker_agent()
+
+        key1 = candidate_set_key(["Email A", "Email  B\n", "Email C"], picker)
+        key2 = candidate_set_key(["Email C", "Email A", " Email B"], picker)
+
+        assert key1 == key2
+
+    def test_depends_on_picker(self):
+        """Test zależności od instrukcji i modelu agenta wybierającego"""
+        picker = create_picker_agent()
+        drafts = ["Email A", "Email B"]
+
+        assert candidate_set_key(drafts, picker) != candidate_set_key(
+            drafts, picker.clone(instructions="Pick the shortest email")
+        )
+        assert candidate_set_key(drafts, picker) != candidate_set_key(
+            drafts, picker.clone(model="gpt-4o")
+        )
+
+
+class TestPickerCache:
+    """Testy pamięci podręcznej decyzji"""
+
+    def test_hit_and_miss_stats(self):
+        """Test statystyk trafień"""
+        picker = create_picker_agent()
+        cache = PickerCache()
+
+        assert cache.get(["A", "B"], picker) is None
+        cache.put(["A", "B"], picker, "B")
+
+        assert cache.get(["B", "A"], picker) == "B"
+        assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    def test_lru_eviction(self):
+        """Test usuwania najdawniej używanych wpisów"""
+        picker = create_picker_agent()
+        cache = PickerCache(max_entries=2)
+        cache.put(["1"], picker, "1")
+        cache.put(["2"], picker, "2")
+        cache.get(["1"], picker)
+        cache.put(["3"], picker, "3")
+
+        assert len(cache) == 2
+        assert cache.get(["2"], picker) is None
+        assert cache.get(["1"], picker) == "1"
+
+    def test_persistence(self, tmp_path):
+        """Test zapisu i ponownego wczytania z pliku"""
+        picker = create_picker_agent()
+        path = tmp_path / "picker_cache.json"
+        cache = PickerCache(path=path)
+        cache.put(["A", "B"], picker, "A")
+        cache.save()
+
+        restored = PickerCache(path=path)
+
+        assert restored.get(["B", "A"], picker) == "A"
+
+    def test_save_requires_path(self):
+        """Test błędu zapisu bez ścieżki"""
+        with pytest.raises(ValueError, match="path"):
+            PickerCache().save()
+
+
+class TestPickBestEmail:
+    """Testy integracji z pick_best_email"""
+
+    @pytest.mark.asyncio
+    async def test_cached_decision_skips_picker_run(self):
+        """Test pominięcia wywołania agenta przy powtórzonym zbiorze wariantów"""
+        picker = create_picker_agent()
+        cache = PickerCache()
+
+        with patch("main.run_final_output", new=AsyncMock(return_value="Email B")) as mock_run:
+            first = await pick_best_email(picker, ["Email A", "Email B"], cache)
+            second = await pick_best_email(picker, ["Email B", "Email A"], cache)
+
+        assert first == second == "Email B"
+        assert mock_run.await_count == 1
+        assert cache.hit_rate == 0.5
@@ -0,0 +1,119 @@
+"""
+Testy jednostkowe dla modułu profiling.py
+
+Testy sprawdzają:
+- Brak pomiarów, gdy profilowanie jest wyłączone
+- Podział czasu etapu na CPU i oczekiwanie (także w zadaniach z asyncio.gather)
+- CPU wątków asyncio.to_thread i pozostałych wątków procesu
+- Zapis próbek stosów w formacie "collapsed stacks"
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiling import Profiler, stage  # noqa: E402
+
+
+def burn_cpu(seconds: float) -> None:
+    """Aktywnie zużywa CPU przez zadany czas."""
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def row(profiler: Profiler, name: str) -> dict:
+    return next(r for r in profiler.rows() if r["stage"] == name)
+
+
+class TestStage:
+    """Testy oznaczania etapów"""
+
+    def test_stage_without_profiler_is_noop(self):
+        """Test, że etap bez włączonego profilera niczego nie zapisuje"""
+        with stage("anything"):
+            pass
+
+    def test_only_one_profiler(self):
+        """Test blokady drugiego profilera w tym samym procesie"""
+        with Profiler(sample_interval=0):
+            with pytest.raises(RuntimeError):
+                Profiler(sample_interval=0).__enter__()
+
+
+class TestProfiler:
+    """Testy podziału czasu na CPU i oczekiwanie"""
+
+    def test_cpu_and_await_split(self):
+        """Test rozdzielenia pracy CPU od oczekiwania, także w zadaniach potomnych"""
+
+        async def worker() -> None:
+            burn_cpu(0.05)
+            await asyncio.sleep(0.1)
+
+        async def pipeline() -> None:
+            with stage("pipeline"):
+                with stage("drafts"):
+                    await asyncio.gather(worker(), worker())
+                with stage("build"):
+                    burn_cpu(0.05)
+
+        with Profiler(sample_interval=0) as profiler:
+            asyncio.run(pipeline())
+
+        drafts = row(profiler, "pipeline/drafts")
+        build = row(profiler, "pipeline/build")
+        total = row(profiler, "pipeline")
+
+        assert drafts["cpu"] == pytest.approx(0.1, abs=0.03)
+        assert drafts["await"] == pytest.approx(0.1, abs=0.05)
+        assert build["cpu"] == pytest.approx(0.05, abs=0.02)
+        assert build["await"] < 0.02
+        assert total["cpu"] >= drafts["cpu"] + build["cpu"]
+        assert total["calls"] == 1
+
+    def test_to_thread_cpu_not_counted_as_await(self):
+        """Test przypisania CPU z asyncio.to_thread do etapu zamiast do oczekiwania"""
+
+        async def pipeline() -> None:
+            with stage("send"):
+                await asyncio.to_thread(burn_cpu, 0.1)
+
+        with Profiler(sample_interval=0) as profiler:
+            asyncio.run(pipeline())
+
+        send = row(profiler, "send")
+        assert send["thread_cpu"] == pytest.approx(0.1, abs=0.03)
+        assert send["await"] < 0.03
+        assert asyncio.to_thread.__name__ == "to_thread"
+
+    def test_other_threads_cpu_reported(self):
+        """Test ujęcia CPU innych wątków procesu w podsumowaniu"""
+        with Profiler(sample_interval=0) as profiler:
+            thread = threading.Thread(target=burn_cpu, args=(0.1,))
+            thread.start()
+            thread.join()
+
+        assert profiler.other_threads_cpu == pytest.approx(0.1, abs=0.05)
+
+    def test_flamegraph_output(self, tmp_path):
+        """Test formatu "collapsed stacks": ramki oddzielone średnikami i liczba próbek"""
+        with Profiler(sample_interval=0.001) as profiler:
+            with stage("busy"):
+                burn_cpu(0.05)
+
+        path = tmp_path / "profile.folded"
+        profiler.write_flamegraph(str(path))
+
+        lines = path.read_text().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert "burn_cpu (test_profiling.py)" in path.read_text()
+        assert ";" in stack
@@ -0,0 +1,212 @@
+"""
+Testy jednostkowe dla modułu service.py
+
+Testy sprawdzają:
+- Limity równoczesnych żądań na klienta
+- Strumieniowanie e-maila przez SSE
+- Endpoint wyboru najlepszego e-maila
+- Walidację żądań
+- Zwalnianie limitu po rozłączeniu klienta i nieblokującą wysyłkę
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import httpx
+import pytest
+from agents import set_tracing_disabled
+from openai import AsyncOpenAI
+from starlette.requests import Request
+from starlette.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("SENDGRID_API_KEY", "test_key")
+
+from mock_servers import MockBehavior, create_openai_app  # noqa: E402
+from service import (  # noqa: E402
+    ClientLimiter,
+    ReleasingStreamingResponse,
+    client_id,
+    create_app,
+    send_email_async,
+)
+
+# Klucz "mock" nie pozwala na eksport śladów do platformy OpenAI
+set_tracing_disabled(True)
+
+
+def service_client(max_requests_per_client: int = 4, max_concurrent_runs: int = 50) -> TestClient:
+    """Klient testowy usługi, której klient OpenAI kieruje żądania do mocka."""
+    behavior = MockBehavior(median_latency_ms=0, delta_interval_ms=0, words_per_email=5)
+    transport = httpx.ASGITransport(app=create_openai_app(behavior))
+    openai_client = AsyncOpenAI(
+        base_url="http://mock/v1",
+        api_key="mock",
+        http_client=httpx.AsyncClient(transport=transport),
+        max_retries=0,
+    )
+    return TestClient(
+        create_app(
+            openai_client,
+            max_requests_per_client=max_requests_per_client,
+            max_concurrent_runs=max_concurrent_runs,
+        )
+    )
+
+
+class TestClientLimiter:
+    """Testy limitów na klienta"""
+
+    def test_limit_per_client(self):
+        """Test odrzucenia żądania ponad limit i zwolnienia miejsca"""
+        limiter = ClientLimiter(max_per_client=2)
+
+        assert limiter.try_acquire("a")
+        assert limiter.try_acquire("a")
+        assert not limiter.try_acquire("a")
+        assert limiter.try_acquire("b")
+
+        limiter.release("a")
+        assert limiter.active("a") == 1
+        assert limiter.try_acquire("a")
+
+    def test_release_removes_idle_clients(self):
+        """Test, że nieaktywni klienci nie zajmują pamięci"""
+        limiter = ClientLimiter(max_per_client=1)
+        limiter.try_acquire("a")
+        limiter.release("a")
+
+        assert limiter._active == {}
+
+
+class TestEndpoints:
+    """Testy endpointów usługi"""
+
+    def test_stream_email(self):
+        """Test strumieniowania delt jako SSE"""
+        with service_client() as client:
+            response = client.post("/emails/stream?persona=2", json={"message": "Write"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line for line in response.text.splitlines() if line.startswith("data:")]
+        deltas = [json.loads(line[5:]).get("delta", "") for line in events]
+        assert "".join(deltas).startswith("Dear CEO")
+        assert "event: done" in response.text
+
+    def test_best_email(self):
+        """Test wyboru najlepszego e-maila"""
+        with service_client() as client:
+            response = client.post("/emails/best", json={})
+
+        assert response.status_code == 200
+        assert response.json()["email"].startswith("Dear CEO")
+
+    def test_handoff_manager_uses_compaction(self):
+        """Test przebiegu z handoff z kompaktowaniem i przekazaniem zwycięskiej wersji"""
+        with service_client() as client:
+            state = client.app.state
+            handoff = state.handoff_manager.handoffs[0]
+            response = client.post("/managers/handoff", json={})
+
+        assert response.status_code == 200
+        assert list(handoff.input_json_schema["properties"]) == ["draft_id"]
+        assert state.handoff_run_config.call_model_input_filter is not None
+
+    def test_rejects_over_limit(self):
+        """Test odpowiedzi 429 po przekroczeniu limitu klienta"""
+        with service_client(max_requests_per_client=0) as client:
+            response = client.post("/emails/best", json={})
+
+        assert response.status_code == 429
+
+    def test_client_identified_by_address_not_header(self):
+        """Test, że nagłówek X-Client-Id nie pozwala ominąć limitu klienta"""
+        scope = {
+            "type": "http",
+            "client": ("10.0.0.7", 5000),
+            "headers": [(b"x-client-id", b"random-123")],
+        }
+
+        assert client_id(Request(scope)) == "10.0.0.7"
+
+    def test_global_run_limit_released(self):
+        """Test zwalniania wspólnego limitu przebiegów po żądaniach"""
+        with service_client(max_concurrent_runs=1) as client:
+            for path in ("/emails/best", "/emails/stream"):
+                assert client.post(path, json={}).status_code == 200
+            upstream = client.app.state.upstream
+
+        assert not upstream.locked()
+
+    def test_invalid_persona(self):
+        """Test walidacji parametru persona"""
+        with service_client() as client:
+            response = client.post("/emails/stream?persona=7", json={})
+
+        assert response.status_code == 400
+
+    def test_invalid_message(self):
+        """Test walidacji pola message"""
+        with service_client() as client:
+            response = client.post("/managers/tools", json={"message": ""})
+
+        assert response.status_code == 400
+
+
+class TestEventLoopSafety:
+    """Testy zachowania pętli zdarzeń i limitów przy rozłączeniach"""
+
+    @pytest.mark.asyncio
+    async def test_slot_released_when_cancelled_before_first_chunk(self):
+        """Test zwolnienia miejsca klienta po anulowaniu przed startem generatora"""
+        limiter = ClientLimiter(max_per_client=1)
+        assert limiter.try_acquire("a")
+        started = asyncio.Event()
+
+        async def content():
+            yield b"data: {}\n\n"
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            started.set()
+            await asyncio.Event().wait()
+
+        response = ReleasingStreamingResponse(content(), lambda: limiter.release("a"))
+        task = asyncio.create_task(response({"type": "http"}, receive, send))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert limiter.active("a") == 0
+
+    @pytest.mark.asyncio
+    async def test_send_tool_runs_off_event_loop(self):
+        """Test wysyłki SendGrid w osobnym wątku (pętla zdarzeń nie jest blokowana)"""
+        threads = []
+
+        def deliver(to_address, subject, body):
+            threads.append(threading.get_ident())
+            return 202
+
+        with patch("service.deliver_email", new=deliver):
+            output = await send_email_async.on_invoke_tool(None, json.dumps({"body": "Hi"}))
+
+        assert "success" in str(output)
+        assert threads and threads[0] != threading.get_ident()
+
+    def test_tools_manager_uses_async_send_tool(self):
+        """Test użycia asynchronicznego narzędzia wysyłki przez kierownika"""
+        with service_client() as client:
+            tools = client.app.state.tools_manager.tools
+
+        assert send_email_async in tools